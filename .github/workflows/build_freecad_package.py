@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 
+import sys
 from argparse import ArgumentParser
 from itertools import chain
 from pathlib import Path
@@ -16,6 +17,8 @@ DEFAULT_FILES = (
     "README.md",
 )
 
+MATERIAL_CATALOGUE = "material_catalogue.pickle"
+
 
 def build_freecad_package(
     source_path: Path = Path(), output_path: Path = Path(), extra_files: list[Path] = []
@@ -57,9 +60,30 @@ def build_freecad_package(
         for filepath in paths:
             zip_file.write(filepath, f"{version_name}/{filepath.relative_to(source_path)}")
 
+        if catalogue := build_material_catalogue(source_path):
+            catalogue_path = package_path / MATERIAL_CATALOGUE
+            zip_file.writestr(
+                f"{version_name}/{catalogue_path.relative_to(source_path)}", catalogue
+            )
+
     return True
 
 
+def build_material_catalogue(source_path: Path) -> bytes | None:
+    # precomputing the catalogue keeps the mat4cad table building out of workbench startup
+    sys.path.insert(0, str(source_path.resolve()))
+    try:
+        from freecad.free2ki.catalogue import catalogue_snapshot
+
+        return catalogue_snapshot()
+    except ImportError as exception:
+        # the catalogue is optional, it is built on first use without the snapshot
+        warning(f"failed to build material catalogue ({exception})")
+        return None
+    finally:
+        sys.path.pop(0)
+
+
 def warning(*values: object, prefix: str = "warning: "):
     output = f"\033[93m{prefix}{' '.join(map(str, values))}\033[0m"
     print(output)
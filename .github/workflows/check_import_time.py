@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+
+import json
+import subprocess
+import sys
+from argparse import ArgumentParser
+from pathlib import Path
+
+# modules the workbench registration has to import, FreeCAD imports init_gui on startup and the
+# workbenches registered by it are initialized as part of the measurement
+STARTUP_MODULES = ("freecad.free2ki.init_gui", "freecad.free2ki.registry", "freecad.free2ki.props")
+
+# modules which may only be imported once a command is activated
+DEFERRED_MODULES = (
+    "numpy",
+    "PySide",
+    "PySide6",
+    "Part",
+    "MeshPart",
+    "freecad.free2ki.mat4cad",
+    "freecad.free2ki.catalogue",
+    "freecad.free2ki.commands",
+    "freecad.free2ki.export_vrml",
+)
+
+DEFAULT_BUDGET_MS = 50.0
+
+# without FreeCAD (e.g. on CI), its modules are replaced by stand-ins that accept everything,
+# which leaves only the import time of the workbench itself to measure
+STAND_IN_SCRIPT = """
+import sys, types
+
+
+class StandIn:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __call__(self, *args, **kwargs):
+        return StandIn()
+
+    def __getattr__(self, name):
+        return StandIn()
+
+
+class StandInModule(types.ModuleType):
+    def __getattr__(self, name):
+        return StandIn
+
+
+for name in ("FreeCAD", "FreeCADGui"):
+    try:
+        __import__(name)
+    except ImportError:
+        sys.modules[name] = StandInModule(name)
+"""
+
+MEASURE_SCRIPT = """
+import json, sys, time
+sys.path.insert(0, {source!r})
+{stand_ins}
+import FreeCADGui
+
+workbenches = []
+add_workbench = FreeCADGui.addWorkbench
+
+
+def record_workbench(workbench):
+    workbenches.append(workbench)
+    return add_workbench(workbench)
+
+
+FreeCADGui.addWorkbench = record_workbench
+
+start = time.perf_counter()
+import {module}
+durations = [["importing '{module}'", time.perf_counter() - start]]
+for workbench in workbenches:
+    start = time.perf_counter()
+    workbench.Initialize()
+    name = type(workbench).__name__
+    durations.append([f"initializing '{{name}}'", time.perf_counter() - start])
+print(json.dumps([durations, [name for name in {deferred!r} if name in sys.modules]]))
+"""
+
+
+def check_import_time(
+    source_path: Path = Path(),
+    modules: list[str] = list(STARTUP_MODULES),
+    budget_ms: float = DEFAULT_BUDGET_MS,
+    python: str = sys.executable,
+) -> bool:
+    success = True
+    for module in modules:
+        # every module is measured in a fresh interpreter, so nothing is imported yet
+        script = MEASURE_SCRIPT.format(
+            source=str(source_path.resolve()),
+            stand_ins=STAND_IN_SCRIPT,
+            module=module,
+            deferred=DEFERRED_MODULES,
+        )
+        result = subprocess.run([python, "-c", script], capture_output=True, text=True)
+        if result.returncode:
+            error(f"failed to import '{module}'\n{result.stderr}")
+            success = False
+            continue
+
+        durations, deferred = json.loads(result.stdout.splitlines()[-1])
+        for stage, duration in durations:
+            duration_ms = duration * 1000
+            print(f"info: {stage} took {duration_ms:.1f} ms")
+            if duration_ms > budget_ms:
+                error(f"{stage} exceeds the budget of {budget_ms:.1f} ms")
+                success = False
+        if deferred:
+            error(f"'{module}' imports deferred modules on startup: {', '.join(deferred)}")
+            success = False
+
+    return success
+
+
+def error(*values: object, prefix: str = "error: "):
+    output = f"\033[91m{prefix}{' '.join(map(str, values))}\033[0m"
+    print(output, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--source", default="", help="package source directory")
+    parser.add_argument(
+        "--modules", nargs="*", default=list(STARTUP_MODULES), help="modules to measure"
+    )
+    parser.add_argument(
+        "--budget", type=float, default=DEFAULT_BUDGET_MS, help="import time budget (ms)"
+    )
+    parser.add_argument(
+        "--python", default=sys.executable, help="python interpreter (e.g. FreeCAD's)"
+    )
+    args = parser.parse_args()
+
+    if not check_import_time(Path(args.source), args.modules, args.budget, args.python):
+        exit(1)
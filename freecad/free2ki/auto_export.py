@@ -0,0 +1,137 @@
+from pathlib import Path
+from typing import TYPE_CHECKING, cast
+
+import FreeCAD
+from FreeCAD import DocumentObject
+
+from .props import FREE2KI_PROPS
+
+if TYPE_CHECKING:
+    from PySide6.QtCore import QTimer
+
+    from .export_job import ExportJob
+
+AUTO_EXPORT_DELAY_MS = 2000
+
+TRACKED_PROPERTIES = {
+    "Shape",
+    "Placement",
+    "Visibility",
+    "LinkedObject",
+    "LinkPlacement",
+    *FREE2KI_PROPS.ALL,
+    FREE2KI_PROPS.LINEAR_DEFLECTION,
+    FREE2KI_PROPS.ANGULAR_DEFLECTION,
+    FREE2KI_PROPS.TRIANGLE_BUDGET,
+}
+
+
+def prefs_auto_export() -> bool:
+    FSParam: FreeCAD.ParameterGrp = FreeCAD.ParamGet(
+        "User parameter:BaseApp/Preferences/Mod/Free2Ki"
+    )
+    return FSParam.GetBool("AutoExport", False)
+
+
+class AutoExporter:
+    # the observer is registered when FreeCAD loads the workbench, before it is ever activated,
+    # so it has to stay cheap: Qt and the exporter modules (and with them numpy, Part and
+    # mat4cad) are only imported once a document is actually exported
+
+    def __init__(self):
+        # documents without an entry have not been exported in this session yet
+        self.changed_objects: dict[str, set[str]] = {}
+        self.pending_documents: set[str] = set()
+        self.job: "ExportJob | None" = None
+        self.job_document = ""
+        self.timer: "QTimer | None" = None
+
+    def schedule_export(self):
+        if self.timer is None:
+            from .export_job import QTimer
+
+            self.timer = QTimer()
+            self.timer.setSingleShot(True)
+            self.timer.timeout.connect(self.export_pending)
+        # restarting the timer on every save debounces bursts of saves into one export
+        self.timer.start(AUTO_EXPORT_DELAY_MS)
+
+    def slotChangedObject(self, obj: DocumentObject, prop: str):
+        if prop not in TRACKED_PROPERTIES:
+            return
+        if (changed := self.changed_objects.get(obj.Document.Name)) is not None:
+            changed.add(obj.Name)
+
+    def slotDeletedObject(self, obj: DocumentObject):
+        self.slotChangedObject(obj, "Shape")
+
+    def slotDeletedDocument(self, doc: FreeCAD.Document):
+        self.changed_objects.pop(doc.Name, None)
+        self.pending_documents.discard(doc.Name)
+
+    def slotFinishSaveDocument(self, doc: FreeCAD.Document, filename: str):
+        if not prefs_auto_export():
+            return
+
+        from .cache import prefs_cache_size
+        from .export_gltf import prefs_export_target
+
+        # only the cache makes exports incremental, without it every save would re-mesh everything
+        if not prefs_cache_size():
+            print(
+                "warning: auto export requires the tessellation cache, enable it in the preferences"
+            )
+            return
+
+        path, _ = prefs_export_target(Path(filename))
+        if self.changed_objects.get(doc.Name) == set() and path.exists():
+            return
+
+        self.pending_documents.add(doc.Name)
+        self.schedule_export()
+
+    def export_pending(self):
+        if self.job:
+            self.schedule_export()
+            return
+
+        while self.pending_documents and not self.job:
+            if doc := FreeCAD.listDocuments().get(self.pending_documents.pop()):
+                self.export_document(cast(FreeCAD.Document, doc))
+
+    def export_document(self, doc: FreeCAD.Document):
+        from .cache import TessellationCache
+        from .export_gltf import prefs_export_target
+        from .export_job import ExportJob, Qt
+        from .objects import get_shape_instances
+
+        changed = self.changed_objects.get(doc.Name)
+        self.changed_objects[doc.Name] = set()
+
+        if not (objects := get_shape_instances(doc.RootObjects)):
+            return
+
+        path, writer = prefs_export_target(Path(doc.FileName))
+        if changed is None:
+            print(f'info: auto exporting "{path.name}"')
+        else:
+            print(f'info: auto exporting "{path.name}" ({len(changed)} changed objects)')
+
+        # the changed objects are only tracked to skip saves without changes, unchanged objects
+        # are loaded from the tessellation cache instead of being meshed
+        self.job = ExportJob(path, objects, writer, cache=TessellationCache())
+        # finished is emitted from the job thread and the exporter isn't a QObject, queueing the
+        # call runs it on the main thread the job was created on, which the next export needs
+        self.job.finished.connect(self.on_finished, Qt.ConnectionType.QueuedConnection)
+        self.job_document = doc.Name
+        try:
+            self.job.start()
+        except Exception as exception:
+            self.on_finished(exception)
+
+    def on_finished(self, exception: Exception | None):
+        if exception:
+            self.changed_objects.pop(self.job_document, None)
+            print(f"warning: auto export failed: {exception}")
+        self.job = None
+        self.export_pending()
@@ -0,0 +1,353 @@
+import io
+import json
+import platform
+import sys
+import tracemalloc
+from argparse import ArgumentParser, ArgumentTypeError
+from collections.abc import Callable
+from contextlib import redirect_stdout
+from datetime import UTC, datetime
+from itertools import islice
+from math import ceil, sqrt
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import NamedTuple, cast
+
+import FreeCAD
+import Part
+
+from .cache import TessellationCache
+from .catalogue import catalogue
+from .compression import DEFAULT_COMPRESSION_LEVEL, DEFAULT_COMPRESSION_THREADS
+from .decimation import DecimationParameters
+from .export_vrml import DEFAULT_PRECISION, ExportProgress, export_vrml
+from .objects import ShapeInstance, get_shape, get_shape_instances
+from .profiling import ExportProfile
+from .props import FREE2KI_PROPS
+from .tessellation import MeshParameters
+
+RESULTS_VERSION = 1
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+DEFAULT_FORMATS = ("wrl", "wrz")
+DEFAULT_REPEAT = 3
+DEFAULT_THRESHOLD = 0.1
+
+PITCH = 2.54
+BODY_FACES = 1_000
+MATERIAL_COUNT = 4
+
+
+def filleted_box() -> Part.Shape:
+    box = Part.makeBox(2.0, 1.0, 1.0)
+    return box.makeFillet(0.2, box.Edges)
+
+
+def chamfered_pin() -> Part.Shape:
+    pin = Part.makeBox(0.64, 0.64, 6.0)
+    top_edges = [edge for edge in pin.Edges if edge.BoundBox.ZMin > 6.0 - 1e-6]
+    return pin.makeChamfer(0.2, top_edges)
+
+
+def grid_positions(count: int):
+    columns = ceil(sqrt(count))
+    return [FreeCAD.Vector(i % columns * PITCH, i // columns * PITCH, 0.0) for i in range(count)]
+
+
+def compound(template: Part.Shape, count: int) -> Part.Compound:
+    shapes: list[Part.Shape] = []
+    for position in grid_positions(count):
+        shape = template.copy()
+        shape.translate(position)
+        shapes.append(shape)
+    return Part.makeCompound(shapes)
+
+
+def add_shape(document: FreeCAD.Document, name: str, shape: Part.Shape):
+    obj = cast(Part.Feature, document.addObject("Part::Feature", name))
+    obj.Shape = shape
+    return obj
+
+
+def build_filleted_boxes(document: FreeCAD.Document, faces: int):
+    # many small objects, like the components on a board
+    template = filleted_box()
+    for i, position in enumerate(grid_positions(ceil(faces / len(template.Faces)))):
+        obj = add_shape(document, f"Box{i}", template)
+        obj.Placement = FreeCAD.Placement(position, FreeCAD.Rotation())
+
+
+def build_pin_array(document: FreeCAD.Document, faces: int):
+    # a single object with many faces, like a connector
+    template = chamfered_pin()
+    add_shape(document, "Pins", compound(template, ceil(faces / len(template.Faces))))
+
+
+def build_multi_material(document: FreeCAD.Document, faces: int):
+    template = filleted_box()
+    materials = list(islice(catalogue(), MATERIAL_COUNT))
+    boxes_per_body = ceil(BODY_FACES / len(template.Faces))
+    body_columns = ceil(sqrt(boxes_per_body))
+    for i, position in enumerate(grid_positions(ceil(faces / BODY_FACES))):
+        obj = add_shape(document, f"Body{i}", compound(template, boxes_per_body))
+        # every body is a grid of boxes itself, so bodies are spread out further
+        obj.Placement = FreeCAD.Placement(position * body_columns, FreeCAD.Rotation())
+        obj.addProperty("App::PropertyStringList", FREE2KI_PROPS.MATERIALS)
+        obj.addProperty("App::PropertyIntegerList", FREE2KI_PROPS.MATERIAL_INDICES)
+        setattr(obj, FREE2KI_PROPS.MATERIALS, materials)
+        setattr(
+            obj,
+            FREE2KI_PROPS.MATERIAL_INDICES,
+            [j % len(materials) for j in range(len(obj.Shape.Faces))],
+        )
+
+
+SCENES: dict[str, Callable[[FreeCAD.Document, int], None]] = {
+    "filleted_boxes": build_filleted_boxes,
+    "pin_array": build_pin_array,
+    "multi_material": build_multi_material,
+}
+
+
+class BenchmarkResult(NamedTuple):
+    scene: str
+    size: int
+    format: str
+    faces: int
+    triangles: int
+    seconds: float
+    peak_memory: int
+    output_size: int
+
+    @property
+    def key(self):
+        return f"{self.scene}/{self.size}/{self.format}"
+
+    @property
+    def triangles_per_second(self):
+        return self.triangles / self.seconds if self.seconds else 0.0
+
+
+def run_benchmark(
+    scene: str, size: int, formats: list[str], repeat: int, output_dir: Path, workers: int = 1
+):
+    document = FreeCAD.newDocument(f"Free2KiBenchmark_{scene}_{size}")
+    try:
+        SCENES[scene](document, size)
+        document.recompute()
+        objects = get_shape_instances(document.RootObjects)
+        faces = sum(len(get_shape(instance.obj).Faces) for instance in objects)
+
+        results: list[BenchmarkResult] = []
+        for output_format in formats:
+            path = output_dir / f"{scene}_{size}.{output_format}"
+            seconds, triangles = min(
+                export_once(path, objects, output_format, workers) for _ in range(repeat)
+            )
+            # tracing slows the export down, so peak memory is measured in a separate run, which
+            # always meshes in this process, as tracemalloc doesn't see worker processes
+            tracemalloc.start()
+            try:
+                export_once(path, objects, output_format, workers=1)
+                _, peak_memory = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+
+            results.append(
+                BenchmarkResult(
+                    scene,
+                    size,
+                    output_format,
+                    faces,
+                    triangles,
+                    seconds,
+                    peak_memory,
+                    path.stat().st_size,
+                )
+            )
+        return results
+    finally:
+        FreeCAD.closeDocument(document.Name)
+
+
+def export_once(path: Path, objects: list[ShapeInstance], output_format: str, workers: int):
+    triangles = 0
+
+    def on_progress(progress: ExportProgress):
+        nonlocal triangles
+        triangles = progress.triangles
+
+    # every run starts with an empty tessellation cache, like the first export of a document,
+    # all other settings are fixed so results don't depend on the user's preferences
+    with TemporaryDirectory() as cache_dir, redirect_stdout(io.StringIO()):
+        start = perf_counter()
+        export_vrml(
+            path,
+            objects,
+            use_compression=output_format == "wrz",
+            precision=DEFAULT_PRECISION,
+            workers=workers,
+            cache=TessellationCache(Path(cache_dir)),
+            parameters=MeshParameters(),
+            adaptive=False,
+            lod_factors=(),
+            decimation=DecimationParameters(),
+            use_instancing=False,
+            merge_materials=False,
+            export_normals=False,
+            triangle_budget=0,
+            progress=on_progress,
+            profile=ExportProfile(),
+            compression_level=DEFAULT_COMPRESSION_LEVEL,
+            compression_threads=DEFAULT_COMPRESSION_THREADS,
+        )
+        seconds = perf_counter() - start
+    return seconds, triangles
+
+
+def save_results(path: Path, results: list[BenchmarkResult]):
+    data = {
+        "version": RESULTS_VERSION,
+        "date": datetime.now(UTC).isoformat(),
+        "freecad": ".".join(FreeCAD.Version()[:3]),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": [result._asdict() for result in results],
+    }
+    path.write_text(json.dumps(data, indent=2))
+
+
+def load_results(path: Path) -> dict[str, BenchmarkResult]:
+    data = json.loads(path.read_text())
+    if data.get("version") != RESULTS_VERSION:
+        raise ValueError(f'unsupported benchmark results version in "{path}"')
+    results = (BenchmarkResult(**result) for result in data["results"])
+    return {result.key: result for result in results}
+
+
+def compare_results(
+    results: list[BenchmarkResult],
+    baseline: dict[str, BenchmarkResult],
+    threshold: float = DEFAULT_THRESHOLD,
+):
+    # returns the regressions, changes are relative to the baseline and positive when worse
+    regressions: list[str] = []
+    for result in results:
+        if (previous := baseline.get(result.key)) is None:
+            continue
+        changes = {
+            "throughput": relative_change(
+                result.triangles_per_second, previous.triangles_per_second, lower_is_better=False
+            ),
+            "peak memory": relative_change(result.peak_memory, previous.peak_memory),
+            "output size": relative_change(result.output_size, previous.output_size),
+        }
+        for metric, change in changes.items():
+            if change > threshold:
+                regressions.append(f"{result.key}: {metric} regressed by {change:.1%}")
+    return regressions
+
+
+def relative_change(value: float, previous: float, lower_is_better: bool = True):
+    if not previous:
+        return 0.0
+    change = (value - previous) / previous
+    return change if lower_is_better else -change
+
+
+def print_results(
+    results: list[BenchmarkResult], baseline: dict[str, BenchmarkResult] | None = None
+):
+    width = max(len(result.key) for result in results)
+    print()
+    print(
+        f"{'benchmark':<{width}}  {'faces':>8}  {'triangles':>10}  {'time':>8}  "
+        f"{'tri/s':>10}  {'memory':>10}  {'size':>10}"
+    )
+    for result in results:
+        line = (
+            f"{result.key:<{width}}  {result.faces:>8}  {result.triangles:>10}  "
+            f"{result.seconds:>7.3f}s  {result.triangles_per_second:>10.0f}  "
+            f"{result.peak_memory / 2**20:>6.1f} MiB  {result.output_size / 2**10:>6.0f} KiB"
+        )
+        previous = baseline.get(result.key) if baseline else None
+        if previous and previous.triangles_per_second:
+            change = result.triangles_per_second / previous.triangles_per_second - 1.0
+            line += f"  ({change:+.1%} tri/s)"
+        print(line)
+
+
+def positive_int(value: str):
+    if (number := int(value)) < 1:
+        raise ArgumentTypeError(f"{value} is not a positive integer")
+    return number
+
+
+def main(args: list[str] | None = None):
+    parser = ArgumentParser(
+        prog="python -m freecad.free2ki.benchmark",
+        description="Benchmark the VRML export on generated scenes.",
+    )
+    parser.add_argument(
+        "--scenes", nargs="+", choices=list(SCENES), default=list(SCENES), help="scenes to run"
+    )
+    parser.add_argument(
+        "--sizes", nargs="+", type=int, default=list(DEFAULT_SIZES), help="face counts per scene"
+    )
+    parser.add_argument(
+        "--formats", nargs="+", choices=DEFAULT_FORMATS, default=list(DEFAULT_FORMATS)
+    )
+    parser.add_argument(
+        "-r",
+        "--repeat",
+        type=positive_int,
+        default=DEFAULT_REPEAT,
+        help="runs per benchmark (best counts)",
+    )
+    parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=1,
+        help="tessellation workers (peak memory is always measured with one)",
+    )
+    parser.add_argument("--out", type=Path, help="write the results to this JSON file")
+    parser.add_argument("--baseline", type=Path, help="compare against previous results")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help=f"relative regression threshold (default: {DEFAULT_THRESHOLD})",
+    )
+    parsed = parser.parse_args(args)
+
+    baseline = load_results(parsed.baseline) if parsed.baseline else None
+
+    results: list[BenchmarkResult] = []
+    with TemporaryDirectory() as output_dir:
+        for scene in parsed.scenes:
+            for size in parsed.sizes:
+                print(f'info: running "{scene}" with {size} faces')
+                results += run_benchmark(
+                    scene, size, parsed.formats, parsed.repeat, Path(output_dir), parsed.workers
+                )
+
+    print_results(results, baseline)
+    if parsed.out:
+        save_results(parsed.out, results)
+        print(f'\ninfo: wrote benchmark results "{parsed.out}"')
+
+    if baseline is None:
+        return 0
+    if regressions := compare_results(results, baseline, parsed.threshold):
+        print()
+        for regression in regressions:
+            print(f"error: {regression}", file=sys.stderr)
+        return 1
+    print("\ninfo: no regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
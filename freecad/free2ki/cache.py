@@ -0,0 +1,100 @@
+import hashlib
+import os
+from contextlib import suppress
+from pathlib import Path
+from zipfile import BadZipFile
+
+import numpy as np
+
+import FreeCAD
+
+from .tessellation import Faces, MeshArrays, Points, Triangles
+
+MB = 1 << 20
+DEFAULT_CACHE_SIZE_MB = 512
+
+
+def prefs_cache_size() -> int:
+    FSParam: FreeCAD.ParameterGrp = FreeCAD.ParamGet(
+        "User parameter:BaseApp/Preferences/Mod/Free2Ki"
+    )
+    return FSParam.GetInt("TessellationCacheSize", DEFAULT_CACHE_SIZE_MB) * MB
+
+
+def default_cache_path():
+    return Path(FreeCAD.getUserCachePath()) / "Free2Ki" / "tessellation"
+
+
+class TessellationCache:
+    SUFFIX = ".npz"
+    # temporary files must not match the entries, which other processes may prune concurrently
+    TEMP_SUFFIX = ".tmp"
+
+    def __init__(self, path: Path | None = None, max_size: int | None = None):
+        self.path = path or default_cache_path()
+        self.max_size = prefs_cache_size() if max_size is None else max_size
+
+    @staticmethod
+    def key(brep: str, *parameters: float):
+        digest = hashlib.sha256(brep.encode())
+        digest.update(np.array(parameters, dtype=np.float64).tobytes())
+        return digest.hexdigest()
+
+    def load(self, key: str) -> MeshArrays | None:
+        path = self.path / (key + self.SUFFIX)
+        try:
+            with np.load(path) as data:
+                points = data["points"].astype(np.float64)
+                triangles = data["triangles"].astype(np.int64)
+                faces = data["faces"].astype(np.int64)
+        except FileNotFoundError:
+            return None
+        except (OSError, KeyError, ValueError, EOFError, BadZipFile):
+            # corrupted entries, e.g. left by a crash, are treated as a miss and removed
+            with suppress(OSError):
+                path.unlink(missing_ok=True)
+            return None
+
+        path.touch()
+        return points, triangles, faces
+
+    def store(self, key: str, points: Points, triangles: Triangles, faces: Faces):
+        self.path.mkdir(parents=True, exist_ok=True)
+        path = self.path / (key + self.SUFFIX)
+        # mesh points are single precision internally, so float32 is lossless
+        temp_path = path.with_name(f"{key}.{os.getpid()}{self.TEMP_SUFFIX}")
+        try:
+            # savez appends its suffix to file names, but not to open files
+            with open(temp_path, "wb") as file:
+                np.savez_compressed(
+                    file,
+                    points=points.astype(np.float32),
+                    triangles=triangles.astype(np.uint32),
+                    faces=faces.astype(np.int32),
+                )
+            temp_path.replace(path)
+        except BaseException:
+            temp_path.unlink(missing_ok=True)
+            raise
+
+    def entries(self) -> list[tuple[Path, os.stat_result]]:
+        if not self.path.is_dir():
+            return []
+        entries: list[tuple[Path, os.stat_result]] = []
+        for path in self.path.glob(f"*{self.SUFFIX}"):
+            # other processes may prune entries at the same time
+            with suppress(FileNotFoundError):
+                entries.append((path, path.stat()))
+        return entries
+
+    def prune(self):
+        entries = sorted(self.entries(), key=lambda entry: entry[1].st_mtime, reverse=True)
+        size = 0
+        for path, stat in entries:
+            size += stat.st_size
+            if size > self.max_size:
+                path.unlink(missing_ok=True)
+
+    def clear(self):
+        for path, _ in self.entries():
+            path.unlink(missing_ok=True)
@@ -0,0 +1,101 @@
+import pickle
+from functools import cache, lru_cache
+from pathlib import Path
+
+from .mat4cad import Material, rgb2hex
+from .mat4cad.materials import BASE_MATERIAL_COLORS, BASE_MATERIAL_VARIANTS, BASE_MATERIALS
+
+# generated by build_freecad_package.py, without it materials are built from the mat4cad tables
+CATALOGUE_PATH = Path(__file__).parent / "material_catalogue.pickle"
+CATALOGUE_VERSION = 2
+
+# custom_<hex> colors aren't part of the catalogue, so their cache has to be bounded
+CUSTOM_CACHE_SIZE = 1024
+CUSTOM_COLOR_PREFIX = "custom_"
+
+DEFAULT_MATERIAL = "plastic-mouse_grey-semi_matte"
+
+Color = tuple[float, ...]
+
+
+@cache
+def default_material() -> Material:
+    return get_material(DEFAULT_MATERIAL) or Material()
+
+
+def get_material(name: str) -> Material | None:
+    if (material := (load_snapshot() or {}).get(name)) is not None:
+        return material
+    # names are resolved one by one, building the whole catalogue would be much slower
+    if f"-{CUSTOM_COLOR_PREFIX}" in name:
+        return custom_material(name)
+    if name in catalogue_names():
+        return catalogue_material(name)
+    # other names (e.g. of unassigned objects) aren't cached, there's no bound on them
+    return Material.from_name(name)
+
+
+def get_custom_material(color: Color, base: str = "plastic", variant: str = "semi_matte"):
+    return get_material(f"{base}-{CUSTOM_COLOR_PREFIX}{rgb2hex(color)}-{variant}")
+
+
+def material_color(name: str) -> Color:
+    return tuple(material.diffuse) if (material := get_material(name)) else (0.0, 0.0, 0.0)
+
+
+@cache
+def catalogue_material(name: str) -> Material | None:
+    return Material.from_name(name)
+
+
+@lru_cache(maxsize=CUSTOM_CACHE_SIZE)
+def custom_material(name: str) -> Material | None:
+    return Material.from_name(name)
+
+
+@cache
+def catalogue_names() -> frozenset[str]:
+    return frozenset(
+        f"{base}-{color}-{variant}"
+        for base in BASE_MATERIALS
+        for color in BASE_MATERIAL_COLORS[base]
+        for variant in BASE_MATERIAL_VARIANTS[base] or {"default": None}
+    )
+
+
+@cache
+def catalogue() -> dict[str, Material]:
+    if (snapshot := load_snapshot()) is not None:
+        return snapshot
+    return build_catalogue()
+
+
+@cache
+def load_snapshot() -> dict[str, Material] | None:
+    if not CATALOGUE_PATH.is_file():
+        return None
+    try:
+        with CATALOGUE_PATH.open("rb") as file:
+            data = pickle.load(file)
+        if data["version"] == CATALOGUE_VERSION:
+            return data["materials"]
+        print(f'warning: ignoring outdated material catalogue "{CATALOGUE_PATH}"')
+    except (OSError, EOFError, pickle.UnpicklingError, KeyError, AttributeError) as exception:
+        print(f'warning: failed to load material catalogue "{CATALOGUE_PATH}" ({exception})')
+    return None
+
+
+def build_catalogue() -> dict[str, Material]:
+    materials: dict[str, Material] = {}
+    for base in BASE_MATERIALS:
+        variants = BASE_MATERIAL_VARIANTS[base] or {"default": None}
+        for color in BASE_MATERIAL_COLORS[base]:
+            for variant in variants:
+                name = f"{base}-{color}-{variant}"
+                if material := Material.from_name(name):
+                    materials[name] = material
+    return materials
+
+
+def catalogue_snapshot():
+    return pickle.dumps({"version": CATALOGUE_VERSION, "materials": build_catalogue()})
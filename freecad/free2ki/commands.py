@@ -1,70 +1,175 @@
 import string
+from collections.abc import Callable
+from math import degrees
 from pathlib import Path
-from typing import TYPE_CHECKING, cast
+from time import perf_counter
+from typing import TYPE_CHECKING, Any, NamedTuple
 
 import numpy as np
 from numpy.typing import NDArray
 
 if TYPE_CHECKING:
-    from PySide6.QtCore import QRect, Qt
+    from PySide6.QtCore import (
+        QAbstractItemModel,
+        QAbstractTableModel,
+        QModelIndex,
+        QPersistentModelIndex,
+        QRect,
+        Qt,
+    )
     from PySide6.QtGui import QBrush, QColor, QFontMetrics, QPainter, QPaintEvent
     from PySide6.QtWidgets import *  # pyright: ignore[reportWildcardImportFromLibrary]
 else:
-    from PySide.QtCore import QRect, Qt
+    from PySide.QtCore import (
+        QAbstractItemModel,
+        QAbstractTableModel,
+        QModelIndex,
+        QPersistentModelIndex,
+        QRect,
+        Qt,
+    )
     from PySide.QtGui import QBrush, QColor, QFontMetrics, QPainter, QPaintEvent
     from PySide.QtWidgets import *
 
 import FreeCAD
-from FreeCAD import DocumentObject, GeoFeature, GroupExtension
-from Part import Shape
+from FreeCAD import DocumentObject, GeoFeature
 
 if TYPE_CHECKING:
     from FreeCADGui import SelectionObject
 else:
     SelectionObject = object
 
-from .export_vrml import FREE2KI_PROPS, export_vrml, prefs_use_compression
+from .cache import TessellationCache
+from .catalogue import default_material, get_custom_material, get_material, material_color
+from .export_gltf import prefs_export_target
+from .export_job import ExportJob
+from .export_vrml import (
+    ExportCancelled,
+    ExportProgress,
+    lod_paths,
+    prefs_lod_factors,
+    prefs_mesh_parameters,
+)
 from .mat4cad import Material, hex2rgb, rgb2hex
 from .mat4cad.materials import BASE_MATERIAL_COLORS, BASE_MATERIAL_VARIANTS, BASE_MATERIALS
+from .objects import get_shape, get_shape_instances, get_shape_objects, has_shape
+from .props import FREE2KI_PROPS
 
 
 class Free2KiExport:
+    def __init__(self):
+        self.job: ExportJob | None = None
+        self.dialog: ExportProgressDialog | None = None
+
     def Activated(self):
+        if self.job and self.job.is_running():
+            critical("Error", "Failed to export. Another export is still running.")
+            return
+
         active_document = FreeCAD.ActiveDocument
         if not active_document or not active_document.FileName:
             critical("Error", "Failed to export. Active Document is not saved.")
             return
 
-        if not (objects := get_shape_objects()):
+        if not (objects := get_shape_instances()):
             root_objects: list[FreeCAD.DocumentObject] = active_document.RootObjects
-            if not (objects := get_shape_objects(root_objects)):
+            if not (objects := get_shape_instances(root_objects)):
                 critical("Error", "Failed to export. Nothing to export.")
                 return
 
-        document_path = Path(active_document.FileName)
-        path = document_path.parent / document_path.stem
-        path = path.with_suffix(".wrz" if prefs_use_compression() else ".wrl")
+        path, writer = prefs_export_target(Path(active_document.FileName))
 
-        if path.exists():
-            if path.is_file():
+        lod_factors = prefs_lod_factors()
+        paths = lod_paths(path, lod_factors)
+        for existing_path in filter(Path.exists, paths):
+            if existing_path.is_file():
                 if (
-                    question("Overwrite?", f'"{path}" already exists. Overwrite?')
+                    question("Overwrite?", f'"{existing_path}" already exists. Overwrite?')
                     == QMessageBox.StandardButton.No
                 ):
                     return
             else:
-                critical("Error", f'Failed to export. "{path}" exists and is not a file.')
+                critical("Error", f'Failed to export. "{existing_path}" exists and is not a file.')
                 return
 
-        export_vrml(path, objects)
-        print(f'info: successfully exported "{path.name}"')
+        self.job = ExportJob(path, objects, writer, lod_factors=lod_factors)
+        self.dialog = ExportProgressDialog(self.job, paths)
+        try:
+            self.job.start()
+        except Exception as exception:
+            self.dialog.on_finished(exception)
+
+
+class ExportProgressDialog(QProgressDialog):
+    def __init__(self, job: ExportJob, paths: list[Path]):
+        super().__init__("Preparing export ...", "Cancel", 0, 0)
+        self.setWindowTitle("Free2Ki Export")
+        self.setMinimumWidth(400)
+        self.setMinimumDuration(0)
+        self.setAutoClose(False)
+        self.setAutoReset(False)
+
+        self.job = job
+        self.paths = paths
+        self.start_time = perf_counter()
+
+        job.progressed.connect(self.on_progress)
+        job.finished.connect(self.on_finished)
+        self.canceled.connect(self.on_cancel)
+        self.show()
+
+    def on_progress(self, progress: ExportProgress):
+        if self.wasCanceled():
+            return
+
+        elapsed = perf_counter() - self.start_time
+        remaining = elapsed / progress.done * (progress.total - progress.done)
+        self.setMaximum(progress.total)
+        self.setValue(progress.done)
+        self.setLabelText(
+            f'Exported "{progress.name}" ({progress.done}/{progress.total})\n'
+            f"{progress.triangles} triangles, about {remaining:.0f}s remaining"
+        )
+
+    def on_cancel(self):
+        self.setLabelText("Cancelling ...")
+        self.job.cancel()
+
+    def on_finished(self, exception: Exception | None):
+        self.close()
+        if isinstance(exception, ExportCancelled):
+            print("info: export cancelled")
+        elif exception:
+            critical("Error", f"Failed to export. {exception}")
+        else:
+            for exported_path in self.paths:
+                print(f'info: successfully exported "{exported_path.name}"')
+
 
-    def GetResources(self):
-        return {
-            "Pixmap": str((Path(__file__).parent / "icons" / "kicad-export.png").resolve()),
-            "MenuText": "Export",
-            "Tooltip": "Export selected, visible objects (with children).",
-        }
+class Free2KiClearCache:
+    def Activated(self):
+        cache = TessellationCache()
+        cache.clear()
+        print(f'info: cleared tessellation cache "{cache.path}"')
+
+
+class Free2KiSetMeshQuality:
+    def Activated(self):
+        if not (objects := get_shape_objects()):
+            critical("Error", "Failed to set mesh quality. Nothing is selected.")
+            return
+
+        linear_deflection, angular_deflection, _ = prefs_mesh_parameters()
+        for obj in objects:
+            if FREE2KI_PROPS.LINEAR_DEFLECTION not in obj.PropertiesList:
+                obj.addProperty("App::PropertyLength", FREE2KI_PROPS.LINEAR_DEFLECTION)
+                setattr(obj, FREE2KI_PROPS.LINEAR_DEFLECTION, linear_deflection)
+            if FREE2KI_PROPS.ANGULAR_DEFLECTION not in obj.PropertiesList:
+                obj.addProperty("App::PropertyAngle", FREE2KI_PROPS.ANGULAR_DEFLECTION)
+                setattr(obj, FREE2KI_PROPS.ANGULAR_DEFLECTION, degrees(angular_deflection))
+            if FREE2KI_PROPS.TRIANGLE_BUDGET not in obj.PropertiesList:
+                # 0 falls back to a share of the file budget from the preferences
+                obj.addProperty("App::PropertyInteger", FREE2KI_PROPS.TRIANGLE_BUDGET)
 
 
 Free2KiSelection = dict[GeoFeature, NDArray[np.integer] | None]
@@ -97,145 +202,98 @@ class Free2KiSetMaterials:
         if not (selected_materials := SelectMaterialDialog(selection).execute()):
             return
 
+        assignments: dict[GeoFeature, list[tuple[NDArray[np.integer] | None, Material]]] = {}
         for obj, faces, material in selected_materials:
-            self.setup_material_indices(material, obj, faces)
-        for obj in selection:
-            self.recalculate_materials(obj)
-
-        objects_to_recompute: set[FreeCAD.DocumentObject] = set().union(
-            *({obj, *(parent for parent, _ in obj.Parents)} for obj in selection)
-        )
-        active_doc.recompute(list(objects_to_recompute))
+            assignments.setdefault(obj, []).append((faces, material))
+
+        # all property writes and the recompute become a single undo step
+        active_doc.openTransaction("Set Materials")
+        try:
+            for obj, obj_assignments in assignments.items():
+                materials, material_indices = self.setup_material_indices(obj, obj_assignments)
+                self.recalculate_materials(obj, materials, material_indices)
+            # only the touched objects and the objects depending on them (like the bodies and
+            # parts containing them) are recomputed, instead of the whole document
+            touched: list[DocumentObject] = list(assignments)
+            touched += [parent for obj in assignments for parent in obj.InListRecursive]
+            active_doc.recompute(list(dict.fromkeys(touched)))
+        except Exception:
+            active_doc.abortTransaction()
+            raise
+        active_doc.commitTransaction()
 
     @staticmethod
-    def setup_material_indices(material: Material, obj: GeoFeature, faces: NDArray[np.integer]):
+    def setup_material_indices(
+        obj: GeoFeature, assignments: list[tuple[NDArray[np.integer] | None, Material]]
+    ) -> tuple[list[str], NDArray[np.int_]]:
         if FREE2KI_PROPS.MATERIALS not in obj.PropertiesList:
             obj.addProperty("App::PropertyStringList", FREE2KI_PROPS.MATERIALS)
         if FREE2KI_PROPS.MATERIAL_INDICES not in obj.PropertiesList:
             obj.addProperty("App::PropertyIntegerList", FREE2KI_PROPS.MATERIAL_INDICES)
 
-        materials = getattr(obj, FREE2KI_PROPS.MATERIALS)
-        index = len(materials)
-        materials.append(material.name)
-
-        setattr(obj, FREE2KI_PROPS.MATERIALS, materials)
-
+        materials = list(getattr(obj, FREE2KI_PROPS.MATERIALS))
         material_indices = np.array(getattr(obj, FREE2KI_PROPS.MATERIAL_INDICES), dtype=int)
         material_indices.resize(len(get_shape(obj).Faces))
-        material_indices[faces] = index
-        setattr(obj, FREE2KI_PROPS.MATERIAL_INDICES, material_indices.tolist())
-
-    @staticmethod
-    def recalculate_materials(obj: GeoFeature):
-        materials = getattr(obj, FREE2KI_PROPS.MATERIALS)
-        material_indices = np.array(getattr(obj, FREE2KI_PROPS.MATERIAL_INDICES))
-        material_indices = material_indices[: len(get_shape(obj).Faces)]
-
-        used_materials = list({materials[index] for index in set(material_indices)})
-        index_mapping = np.zeros(len(materials), dtype=int)
-        for i, name in enumerate(used_materials):
-            for index in np.where(np.array(materials, dtype=object) == name):
-                index_mapping[index] = i
-
-        colors = [
-            mat.diffuse if (mat := Material.from_name(name)) else (0.0, 0.0, 0.0)
-            for name in used_materials
-        ]
-        colors = np.array(colors)
-
-        remapped_indices = index_mapping[material_indices]
-        diffuse_color = colors[remapped_indices]
-
-        setattr(obj, FREE2KI_PROPS.MATERIALS, used_materials)
-        setattr(obj, FREE2KI_PROPS.MATERIAL_INDICES, remapped_indices.tolist())
-        setattr(obj.ViewObject, "DiffuseColor", [tuple(color) for color in diffuse_color])
-
-    def GetResources(self):
-        return {
-            "Pixmap": str((Path(__file__).parent / "icons" / "material.png").resolve()),
-            "MenuText": "Set Materials",
-            "Tooltip": "Set material for selected, visible objects.",
-        }
-
-
-def has_shape(obj: GeoFeature):
-    return obj.getPropertyNameOfGeometry() == "Shape"
-
-
-def get_shape(obj: GeoFeature):
-    assert has_shape(obj)
-    return cast(Shape, obj.getPropertyByName("Shape"))
-
 
-def is_partdesign_feature(obj: DocumentObject):
-    return obj.__class__.__module__ == "PartDesign" and obj.__class__.__name__ == "Feature"
+        for faces, material in assignments:
+            material_indices[faces] = len(materials)
+            materials.append(material.name)
+        return materials, material_indices
 
+    @staticmethod
+    def recalculate_materials(
+        obj: GeoFeature, materials: list[str], material_indices: NDArray[np.int_]
+    ):
+        # only the (few) used indices are mapped to names, which are deduplicated in turn
+        used_indices, inverse = np.unique(material_indices, return_inverse=True)
+        used_materials, name_inverse = np.unique(
+            np.array(materials)[used_indices], return_inverse=True
+        )
+        remapped_indices = name_inverse[inverse.reshape(-1)]
 
-def get_shape_objects(objects: list[DocumentObject] | None = None) -> list[GeoFeature]:
-    if objects is None:
-        objects = FreeCAD.Gui.Selection.getSelection()
-
-    shape_objects: list[GeoFeature] = []
-    for obj in objects:
-        if obj.Visibility:
-            if is_partdesign_feature(obj) and isinstance(obj, GeoFeature):
-                shape_objects.append(obj)
-            elif obj.hasExtension("App::GroupExtension"):
-                shape_objects += get_shape_objects(cast(GroupExtension, obj).Group)
-            elif isinstance(obj, GeoFeature) and has_shape(obj) and get_shape(obj).Faces:
-                shape_objects.append(obj)
+        colors = np.array([material_color(name) for name in used_materials.tolist()])
+        diffuse_color = colors[remapped_indices] if len(colors) else colors
 
-    return list(set(shape_objects))
+        setattr(obj, FREE2KI_PROPS.MATERIALS, used_materials.tolist())
+        setattr(obj, FREE2KI_PROPS.MATERIAL_INDICES, remapped_indices.tolist())
+        setattr(obj.ViewObject, "DiffuseColor", list(map(tuple, diffuse_color.tolist())))
 
 
 class SelectMaterialDialog(QDialog):
-    DEFAULT_MATERIAL: Material = Material.from_name("plastic-mouse_grey-semi_matte") or Material()
     MAX_HEIGHT: int = 300
 
-    material_selectors: list[tuple[GeoFeature, NDArray[np.integer], "MaterialSelector"]]
-
     def __init__(self, selection: Free2KiSelection):
         super().__init__(None, Qt.WindowType.WindowTitleHint | Qt.WindowType.WindowCloseButtonHint)
 
-        box_materials = QVBoxLayout()
-
-        self.material_selectors = []
-        names = (
-            body.Label if (body := getattr(obj, "_Body", None)) else obj.Label for obj in selection
+        # only a single selector for bulk assignment is created up front, the table creates
+        # editors when a row is edited and computes existing materials as rows are scrolled to
+        self.bulk_selector = MaterialSelector(default_material())
+        self.model = MaterialTableModel(selection, self.get_existing_materials)
+        self.delegate = MaterialDelegate()
+
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setItemDelegateForColumn(MaterialTableModel.MATERIAL_COLUMN, self.delegate)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.table.setEditTriggers(
+            QAbstractItemView.EditTrigger.DoubleClicked
+            | QAbstractItemView.EditTrigger.SelectedClicked
+            | QAbstractItemView.EditTrigger.EditKeyPressed
         )
-        for name, obj, faces in sorted(zip(names, selection.keys(), selection.values())):
-            existing_materials = self.get_existing_materials(obj, faces)
-
-            if len(selection) > 1 and len(existing_materials) <= 1:
-                box_materials.addWidget(QLabel(name))
-
-            for sub_faces, material in existing_materials:
-                if len(existing_materials) > 1:
-                    label = f"{name} {np.array2string(sub_faces, threshold=7)}"
-                    box_materials.addWidget(QLabel(label))
-                material_selector = MaterialSelector(material)
-                box_materials.addWidget(material_selector)
-                self.material_selectors.append((obj, sub_faces, material_selector))
+        self.table.verticalHeader().hide()
+        self.table.verticalHeader().setDefaultSectionSize(self.bulk_selector.sizeHint().height())
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.setColumnWidth(MaterialTableModel.OBJECT_COLUMN, 200)
+        self.table.setMinimumSize(200 + self.bulk_selector.sizeHint().width(), self.MAX_HEIGHT)
 
-        layout = QVBoxLayout()
+        self.button_assign: QAbstractButton = QPushButton("Assign to Selected")
+        self.button_assign.setToolTip("Assign this material to the selected rows (or all rows)")
+        self.button_assign.clicked.connect(self.assign_material)
 
-        widget_materials = QWidget()
-        widget_materials.setLayout(box_materials)
-        widget_materials.adjustSize()
-        size = widget_materials.size()
-
-        if size.height() > self.MAX_HEIGHT:
-            scroll_area = QScrollArea()
-            scroll_area.setWidget(widget_materials)
-            scroll_area.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
-            scroll_area.setVerticalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOn)
-            scroll_area.adjustSize()
-            scroll_bar = scroll_area.verticalScrollBar()
-            scroll_bar.adjustSize()
-            scroll_area.setFixedSize(size.width() + scroll_bar.size().width(), self.MAX_HEIGHT)
-            layout.addWidget(scroll_area)
-        else:
-            layout.addWidget(widget_materials)
+        row_bulk = QHBoxLayout()
+        row_bulk.addWidget(self.bulk_selector)
+        row_bulk.addWidget(self.button_assign)
 
         self.button_set_material: QAbstractButton = QPushButton("Set Material")
         self.button_set_material.clicked.connect(self.set_material)
@@ -245,8 +303,11 @@ class SelectMaterialDialog(QDialog):
         row_buttons = QHBoxLayout()
         row_buttons.addWidget(self.button_set_material)
         row_buttons.addWidget(self.button_cancel)
-        layout.addLayout(row_buttons)
 
+        layout = QVBoxLayout()
+        layout.addWidget(self.table)
+        layout.addLayout(row_bulk)
+        layout.addLayout(row_buttons)
         self.setLayout(layout)
 
     @classmethod
@@ -263,7 +324,7 @@ class SelectMaterialDialog(QDialog):
 
             face_material_indices = material_indices[faces]
             unique_material_indices = np.unique(face_material_indices)
-            materials = [Material.from_name(name) for name in getattr(obj, FREE2KI_PROPS.MATERIALS)]
+            materials = [get_material(name) for name in getattr(obj, FREE2KI_PROPS.MATERIALS)]
 
             return [
                 (faces[np.nonzero(index == face_material_indices)], materials[index])
@@ -276,10 +337,7 @@ class SelectMaterialDialog(QDialog):
 
                 face_colors = colors[faces]
                 unique_colors = np.unique(face_colors, axis=0)
-                materials = [
-                    Material.from_name(f"plastic-custom_{rgb2hex(color)}-semi_matte") or Material()
-                    for color in unique_colors
-                ]
+                materials = [get_custom_material(color) or Material() for color in unique_colors]
 
                 return [
                     (faces[np.nonzero(np.all(color == face_colors, axis=1))], materials[index])
@@ -288,25 +346,194 @@ class SelectMaterialDialog(QDialog):
             else:
                 color = colors[0]
                 if np.all(np.isclose(color, (0.8, 0.8, 0.8, 0.0))):
-                    material = cls.DEFAULT_MATERIAL
+                    material = default_material()
                 else:
-                    material = (
-                        Material.from_name(f"plastic-custom_{rgb2hex(color)}-semi_matte")
-                        or cls.DEFAULT_MATERIAL
-                    )
+                    material = get_custom_material(color) or default_material()
                 return [(faces, material)]
         else:
-            return [(faces, cls.DEFAULT_MATERIAL)]
+            return [(faces, default_material())]
+
+    def assign_material(self):
+        self.delegate.commit_editor()
+        if not (rows := [index.row() for index in self.table.selectionModel().selectedRows()]):
+            self.model.fetch_all()
+            rows = list(range(self.model.rowCount()))
+        self.model.set_materials(rows, self.bulk_selector.get_material())
 
     def set_material(self):
+        self.delegate.commit_editor()
         self.accept()
 
     def execute(self):
         if self.exec_():
-            return [
-                (obj, faces, material_selector.get_material())
-                for (obj, faces, material_selector) in self.material_selectors
-            ]
+            # rows which were never scrolled to keep their existing materials
+            self.model.fetch_all()
+            return [(row.obj, row.faces, row.material) for row in self.model.rows]
+
+
+class MaterialRow(NamedTuple):
+    label: str
+    obj: GeoFeature
+    faces: NDArray[np.integer]
+    material: Material
+
+
+class MaterialTableModel(QAbstractTableModel):
+    OBJECT_COLUMN = 0
+    MATERIAL_COLUMN = 1
+    HEADERS = ("Object", "Material")
+    FETCH_BATCH_SIZE = 32
+
+    def __init__(
+        self,
+        selection: Free2KiSelection,
+        get_existing_materials: Callable[
+            [GeoFeature, NDArray[np.integer] | None], list[tuple[NDArray[np.integer], Material]]
+        ],
+    ):
+        super().__init__()
+        self.get_existing_materials = get_existing_materials
+        names = (
+            body.Label if (body := getattr(obj, "_Body", None)) else obj.Label for obj in selection
+        )
+        self.pending = sorted(
+            zip(names, selection.keys(), selection.values()), key=lambda item: item[0]
+        )
+        self.fetched = 0
+        self.rows: list[MaterialRow] = []
+
+    def rowCount(self, parent: QModelIndex | QPersistentModelIndex = QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent: QModelIndex | QPersistentModelIndex = QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def canFetchMore(self, parent: QModelIndex | QPersistentModelIndex):
+        return not parent.isValid() and self.fetched < len(self.pending)
+
+    def fetchMore(self, parent: QModelIndex | QPersistentModelIndex):
+        if parent.isValid():
+            return
+
+        rows: list[MaterialRow] = []
+        for name, obj, faces in self.pending[self.fetched : self.fetched + self.FETCH_BATCH_SIZE]:
+            existing_materials = self.get_existing_materials(obj, faces)
+            for sub_faces, material in existing_materials:
+                label = name
+                if len(existing_materials) > 1:
+                    label = f"{name} {np.array2string(sub_faces, threshold=7)}"
+                material = material or default_material()
+                rows.append(MaterialRow(label, obj, sub_faces, material))
+        self.fetched = min(self.fetched + self.FETCH_BATCH_SIZE, len(self.pending))
+
+        if rows:
+            self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(rows) - 1)
+            self.rows += rows
+            self.endInsertRows()
+
+    def fetch_all(self):
+        while self.canFetchMore(QModelIndex()):
+            self.fetchMore(QModelIndex())
+
+    def data(
+        self, index: QModelIndex | QPersistentModelIndex, role: int = Qt.ItemDataRole.DisplayRole
+    ) -> Any:
+        if not index.isValid():
+            return None
+
+        row = self.rows[index.row()]
+        if index.column() == self.OBJECT_COLUMN:
+            if role == Qt.ItemDataRole.DisplayRole:
+                return row.label
+        elif role == Qt.ItemDataRole.DisplayRole:
+            return row.material.name
+        elif role == Qt.ItemDataRole.EditRole:
+            return row.material
+        elif role == Qt.ItemDataRole.DecorationRole:
+            r, g, b = row.material.diffuse[:3]
+            return QColor(int(r * 255), int(g * 255), int(b * 255))
+        return None
+
+    def setData(
+        self,
+        index: QModelIndex | QPersistentModelIndex,
+        value: Any,
+        role: int = Qt.ItemDataRole.EditRole,
+    ):
+        if role != Qt.ItemDataRole.EditRole or index.column() != self.MATERIAL_COLUMN:
+            return False
+        self.set_materials([index.row()], value)
+        return True
+
+    def set_materials(self, rows: list[int], material: Material):
+        if not rows:
+            return
+        for row in rows:
+            self.rows[row] = self.rows[row]._replace(material=material)
+        self.dataChanged.emit(
+            self.index(min(rows), self.MATERIAL_COLUMN), self.index(max(rows), self.MATERIAL_COLUMN)
+        )
+
+    def flags(self, index: QModelIndex | QPersistentModelIndex):
+        flags = super().flags(index)
+        if index.column() == self.MATERIAL_COLUMN:
+            flags |= Qt.ItemFlag.ItemIsEditable
+        return flags
+
+    def headerData(
+        self, section: int, orientation: Qt.Orientation, role: int = Qt.ItemDataRole.DisplayRole
+    ) -> Any:
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return self.HEADERS[section]
+        return None
+
+
+class MaterialDelegate(QStyledItemDelegate):
+    def __init__(self):
+        super().__init__()
+        self.editor: MaterialSelector | None = None
+
+    def createEditor(
+        self,
+        parent: QWidget,
+        option: QStyleOptionViewItem,
+        index: QModelIndex | QPersistentModelIndex,
+    ):
+        self.editor = MaterialSelector()
+        self.editor.setParent(parent)
+        self.editor.setAutoFillBackground(True)
+        return self.editor
+
+    def destroyEditor(self, editor: QWidget, index: QModelIndex | QPersistentModelIndex):
+        if editor is self.editor:
+            self.editor = None
+        super().destroyEditor(editor, index)
+
+    def setEditorData(self, editor: QWidget, index: QModelIndex | QPersistentModelIndex):
+        assert isinstance(editor, MaterialSelector)
+        editor.set_material(index.data(Qt.ItemDataRole.EditRole))
+
+    def setModelData(
+        self,
+        editor: QWidget,
+        model: QAbstractItemModel,
+        index: QModelIndex | QPersistentModelIndex,
+    ):
+        assert isinstance(editor, MaterialSelector)
+        model.setData(index, editor.get_material(), Qt.ItemDataRole.EditRole)
+
+    def updateEditorGeometry(
+        self,
+        editor: QWidget,
+        option: QStyleOptionViewItem,
+        index: QModelIndex | QPersistentModelIndex,
+    ):
+        editor.setGeometry(option.rect)  # pyright: ignore[reportAttributeAccessIssue]
+
+    def commit_editor(self):
+        # the editor of a composite widget isn't committed when a dialog button is clicked
+        if self.editor:
+            self.commitData.emit(self.editor)
 
 
 class MaterialSelector(QWidget):
@@ -341,15 +568,7 @@ class MaterialSelector(QWidget):
         self.combo_variant.setSizePolicy(QSizePolicy.Policy.Fixed, QSizePolicy.Policy.Ignored)
 
         if material:
-            assert material.base and material.color and material.variant
-            self.combo_base_material.setCurrentText(material.base)
-            if material.has_custom_color:
-                assert (custom_color := material.custom_color)
-                self.combo_color.setCurrentText("custom")
-                self.color_hexcode.setText(custom_color)
-            else:
-                self.combo_color.setCurrentText(material.color)
-            self.combo_variant.setCurrentText(material.variant)
+            self.set_material(material)
 
         layout = QHBoxLayout()
         layout.addItem(QSpacerItem(4, 0))
@@ -365,12 +584,23 @@ class MaterialSelector(QWidget):
         layout.addItem(QSpacerItem(4, 0))
         self.setLayout(layout)
 
+    def set_material(self, material: Material):
+        assert material.base and material.color and material.variant
+        self.combo_base_material.setCurrentText(material.base)
+        if material.has_custom_color:
+            assert (custom_color := material.custom_color)
+            self.combo_color.setCurrentText("custom")
+            self.color_hexcode.setText(custom_color)
+        else:
+            self.combo_color.setCurrentText(material.color)
+        self.combo_variant.setCurrentText(material.variant)
+
     def get_material(self):
         base = self.combo_base_material.currentText()
         if (color := self.combo_color.currentText()) == "custom":
             color = f"custom_{rgb2hex(self.custom_color)}"
         variant = self.combo_variant.currentText()
-        assert (material := Material.from_name("-".join((base, color, variant))))
+        assert (material := get_material("-".join((base, color, variant))))
         return material
 
     def on_base_material_change(self, new_base_material: str):
@@ -448,18 +678,3 @@ def critical(title: str, text: str):
 
 def question(title: str, text: str):
     return QMessageBox.question(None, title, text)  # pyright: ignore[reportArgumentType]
-
-
-command_classes = (
-    Free2KiSetMaterials,
-    Free2KiExport,
-)
-
-
-def register_commands():
-    commands: list[str] = []
-    for cls in command_classes:
-        commands.append(cls.__name__)
-        FreeCAD.Gui.addCommand(cls.__name__, cls())
-
-    return commands
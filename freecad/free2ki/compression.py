@@ -0,0 +1,119 @@
+import gzip
+import os
+import struct
+import time
+import zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+
+DEFAULT_COMPRESSION_LEVEL = 9
+# 0 uses all cores
+DEFAULT_COMPRESSION_THREADS = 0
+
+# like pigz, every block is compressed independently, primed with the end of the previous one
+BLOCK_SIZE = 128 << 10
+DICTIONARY_SIZE = 32 << 10
+MAX_PENDING_PER_THREAD = 2
+
+GZIP_MAGIC = b"\x1f\x8b"
+GZIP_OS_UNKNOWN = 255
+
+
+def compression_threads(threads: int):
+    return threads or os.cpu_count() or 1
+
+
+def open_gzip(path: Path, level: int, threads: int):
+    if compression_threads(threads) == 1:
+        return gzip.open(path, "wb", compresslevel=level)
+    return ParallelGzipFile(path, level, threads)
+
+
+def gzip_header(level: int):
+    extra_flags = 2 if level == 9 else 4 if level == 1 else 0
+    return struct.pack(
+        "<2sBBIBB", GZIP_MAGIC, zlib.DEFLATED, 0, int(time.time()), extra_flags, GZIP_OS_UNKNOWN
+    )
+
+
+def compress_block(data: bytes, dictionary: bytes, level: int, last: bool):
+    # raw deflate, so the blocks can be concatenated into a single gzip member
+    if dictionary:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS, zdict=dictionary)
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    # a sync flush ends every block on a byte boundary, only the last one finishes the stream
+    return compressor.compress(data) + compressor.flush(
+        zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH
+    )
+
+
+class ParallelGzipFile:
+    # writes a standard gzip stream, deflating blocks on a thread pool (zlib releases the GIL),
+    # while the caller keeps serializing
+
+    def __init__(
+        self,
+        path: Path,
+        level: int = DEFAULT_COMPRESSION_LEVEL,
+        threads: int = DEFAULT_COMPRESSION_THREADS,
+        block_size: int = BLOCK_SIZE,
+    ):
+        threads = compression_threads(threads)
+        self.level = level
+        self.block_size = max(block_size, DICTIONARY_SIZE)
+        self.executor = ThreadPoolExecutor(threads, thread_name_prefix="Free2KiCompression")
+        self.max_pending = threads * MAX_PENDING_PER_THREAD
+        self.pending: deque[Future[bytes]] = deque()
+        self.buffer = bytearray()
+        self.dictionary = b""
+        self.crc = 0
+        self.size = 0
+
+        self.file = open(path, "wb")
+        self.file.write(gzip_header(level))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type: type[BaseException] | None, *_: object):
+        if exception_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def write(self, data: bytes):
+        self.buffer += data
+        self.crc = zlib.crc32(data, self.crc)
+        self.size += len(data)
+        while len(self.buffer) >= self.block_size:
+            block = bytes(self.buffer[: self.block_size])
+            del self.buffer[: self.block_size]
+            self.submit(block)
+        return len(data)
+
+    def submit(self, block: bytes, last: bool = False):
+        future = self.executor.submit(compress_block, block, self.dictionary, self.level, last)
+        self.pending.append(future)
+        self.dictionary = block[-DICTIONARY_SIZE:]
+        # blocks are written in order, waiting for the oldest one bounds the memory use
+        while len(self.pending) > self.max_pending:
+            self.file.write(self.pending.popleft().result())
+
+    def close(self):
+        if self.file.closed:
+            return
+        try:
+            self.submit(bytes(self.buffer), last=True)
+            self.buffer.clear()
+            while self.pending:
+                self.file.write(self.pending.popleft().result())
+            self.file.write(struct.pack("<II", self.crc, self.size & 0xFFFFFFFF))
+        finally:
+            self.abort()
+
+    def abort(self):
+        self.executor.shutdown(cancel_futures=True)
+        self.pending.clear()
+        self.file.close()
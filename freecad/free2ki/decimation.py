@@ -0,0 +1,323 @@
+from math import inf
+from typing import NamedTuple
+
+import numpy as np
+from numpy.typing import NDArray
+
+from .tessellation import Points, Triangles, compact
+
+MAX_DECIMATION_PASSES = 64
+MAX_FLIP_CHECKS = 4
+# closed components have no boundary holding them in place, so they are kept at a tetrahedron
+MIN_CLOSED_TRIANGLES = 4
+
+CELL_DTYPE = np.dtype([("x", np.int64), ("y", np.int64), ("z", np.int64)])
+# the cell itself and half of its neighbours, the other half is covered by the reverse pairs
+NEIGHBOUR_OFFSETS = [
+    offset
+    for offset in np.stack(np.meshgrid(*[(-1, 0, 1)] * 3, indexing="ij"), axis=-1).reshape(-1, 3)
+    if tuple(offset) >= (0, 0, 0)
+]
+
+
+class DecimationParameters(NamedTuple):
+    weld_tolerance: float = 0.0
+    ratio: float = 1.0
+    max_error: float = 0.0
+
+    @property
+    def enabled(self):
+        return self.weld_tolerance > 0.0 or self.ratio < 1.0 or self.max_error > 0.0
+
+
+def simplify(
+    points: Points, triangles: Triangles, parameters: DecimationParameters
+) -> tuple[Points, Triangles]:
+    if parameters.weld_tolerance > 0.0:
+        points, triangles = weld_vertices(points, triangles, parameters.weld_tolerance)
+    if parameters.ratio < 1.0 or parameters.max_error > 0.0:
+        target = int(len(triangles) * parameters.ratio) if parameters.ratio < 1.0 else 0
+        max_error = parameters.max_error if parameters.max_error > 0.0 else inf
+        points, triangles = decimate(points, triangles, target, max_error)
+    return points, triangles
+
+
+def weld_vertices(
+    points: Points, triangles: Triangles, tolerance: float
+) -> tuple[Points, Triangles]:
+    if not len(points):
+        return points, triangles
+
+    # every group of close points is represented by its lowest index, so numbering the
+    # representatives in order keeps the vertex order stable
+    groups = connected_components(len(points), *close_pairs(points, tolerance))
+    representatives, remap = np.unique(groups, return_inverse=True)
+
+    points = points[representatives]
+    triangles = remap.reshape(-1)[triangles]
+    return points, remove_degenerate(triangles)
+
+
+def close_pairs(points: Points, tolerance: float) -> tuple[NDArray[np.int64], NDArray[np.int64]]:
+    # points are sorted into cells of the size of the tolerance, close points are either in the
+    # same or in neighbouring cells, so only those have to be compared
+    cells = np.ascontiguousarray(np.floor(points / tolerance).astype(np.int64))
+    keys = cells.view(CELL_DTYPE).reshape(-1)
+    cell_keys, cell_of_point, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    order = np.argsort(cell_of_point.reshape(-1), kind="stable")
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+    first: list[NDArray[np.int64]] = []
+    second: list[NDArray[np.int64]] = []
+    cell_coordinates = cell_keys.view(np.int64).reshape(-1, 3)
+    for offset in NEIGHBOUR_OFFSETS:
+        neighbours = np.ascontiguousarray(cell_coordinates + offset).view(CELL_DTYPE).reshape(-1)
+        found = np.minimum(np.searchsorted(cell_keys, neighbours), len(cell_keys) - 1)
+        cell_a = np.flatnonzero(cell_keys[found] == neighbours)
+        cell_b = found[cell_a]
+
+        # all combinations of the points of both cells
+        count_b = counts[cell_b]
+        pair_counts = counts[cell_a] * count_b
+        pair_cell = np.repeat(np.arange(len(cell_a)), pair_counts)
+        local = np.arange(len(pair_cell)) - np.repeat(
+            np.cumsum(pair_counts) - pair_counts, pair_counts
+        )
+        a = order[starts[cell_a][pair_cell] + local // count_b[pair_cell]]
+        b = order[starts[cell_b][pair_cell] + local % count_b[pair_cell]]
+
+        close = np.sum((points[a] - points[b]) ** 2, axis=1) <= tolerance * tolerance
+        first.append(a[close])
+        second.append(b[close])
+    return np.concatenate(first), np.concatenate(second)
+
+
+def connected_components(
+    count: int, first: NDArray[np.int64], second: NDArray[np.int64]
+) -> NDArray[np.int64]:
+    # labels are propagated along the pairs until every component is labeled by its lowest index
+    labels = np.arange(count)
+    while True:
+        previous = labels.copy()
+        np.minimum.at(labels, first, labels[second])
+        np.minimum.at(labels, second, labels[first])
+        labels = labels[labels]
+        if np.array_equal(labels, previous):
+            return labels
+
+
+def decimate(
+    points: Points, triangles: Triangles, target: int, max_error: float = inf
+) -> tuple[Points, Triangles]:
+    points = points.copy()
+    max_cost = max_error * max_error
+    # the quadrics of collapsed vertices are summed up, so costs measure the error against the
+    # planes of the original surface, not just against the result of the previous pass
+    quadrics = vertex_quadrics(points, triangles)
+
+    # collapses keep every vertex in its component, so they are labeled once
+    components = connected_components(
+        len(points), triangles[:, [0, 1]].reshape(-1), triangles[:, [1, 2]].reshape(-1)
+    )
+    _, locked = mesh_edges(len(points), triangles)
+    min_triangles = np.full(len(points), MIN_CLOSED_TRIANGLES)
+    min_triangles[components[locked]] = 0
+    target = max(target, int(min_triangles[np.unique(components[triangles[:, 0]])].sum()))
+
+    for _ in range(MAX_DECIMATION_PASSES):
+        if len(triangles) <= target:
+            break
+
+        edges, locked = mesh_edges(len(points), triangles)
+        edges = edges[~(locked[edges[:, 0]] & locked[edges[:, 1]])]
+        if not len(edges):
+            break
+
+        # locked vertices may absorb their neighbours, but never move
+        swap = locked[edges[:, 1]]
+        edges[swap] = edges[swap, ::-1]
+        positions, costs = collapse_targets(points, quadrics, edges, locked[edges[:, 0]])
+        candidates = (costs <= max_cost) & link_condition(len(points), triangles, edges)
+        edges, positions, costs = edges[candidates], positions[candidates], costs[candidates]
+
+        # every collapse removes two triangles
+        max_collapses = max((len(triangles) - target + 1) // 2, 1)
+        selected = independent_edges(len(points), edges, costs)
+        triangle_counts = np.bincount(components[triangles[:, 0]], minlength=len(points))
+        selected = selected[
+            within_component_limits(components[edges[selected, 0]], triangle_counts, min_triangles)
+        ][:max_collapses]
+        if not len(selected):
+            break
+
+        for _ in range(MAX_FLIP_CHECKS):
+            new_triangles, new_points = collapse(
+                points, triangles, edges[selected], positions[selected]
+            )
+            # each collapse keeps the surface manifold on its own, but neighbouring ones may not
+            broken = flipped_triangles(points, triangles, new_points, new_triangles) | (
+                non_manifold_triangles(len(points), new_triangles)
+                & ~non_manifold_triangles(len(points), triangles)
+            )
+            if not broken.any():
+                break
+            unsafe = np.zeros(len(points), dtype=bool)
+            unsafe[triangles[broken].reshape(-1)] = True
+            selected = selected[~(unsafe[edges[selected, 0]] | unsafe[edges[selected, 1]])]
+        else:
+            break
+
+        if not len(selected):
+            break
+        # collapsed edges never share a vertex, so the sums don't alias
+        quadrics[edges[selected, 0]] += quadrics[edges[selected, 1]]
+        points, triangles = new_points, remove_degenerate(new_triangles)
+
+    return compact(points, triangles)
+
+
+def vertex_quadrics(points: Points, triangles: Triangles) -> NDArray[np.float64]:
+    v0, v1, v2 = (points[triangles[:, i]] for i in range(3))
+    normals = np.cross(v1 - v0, v2 - v0)
+    lengths = np.linalg.norm(normals, axis=1)
+    valid = lengths > 0.0
+    normals[valid] /= lengths[valid, None]
+    normals[~valid] = 0.0
+
+    planes = np.concatenate((normals, -np.sum(normals * v0, axis=1)[:, None]), axis=1)
+    face_quadrics = planes[:, :, None] * planes[:, None, :]
+
+    corner_quadrics = np.repeat(face_quadrics.reshape(-1, 16), 3, axis=0)
+    quadrics = [
+        np.bincount(triangles.reshape(-1), corner_quadrics[:, i], minlength=len(points))
+        for i in range(16)
+    ]
+    return np.stack(quadrics, axis=1, dtype=np.float64).reshape(-1, 4, 4)
+
+
+def mesh_edges(point_count: int, triangles: Triangles):
+    edges = np.sort(triangles[:, [[0, 1], [1, 2], [2, 0]]].reshape(-1, 2), axis=1)
+    keys, counts = np.unique(edges[:, 0] * point_count + edges[:, 1], return_counts=True)
+    edges = np.stack(np.divmod(keys, point_count), axis=1)
+
+    # boundary (and non-manifold) vertices stay in place, which keeps material seams closed
+    locked = np.zeros(point_count, dtype=bool)
+    locked[edges[counts != 2].reshape(-1)] = True
+    return edges, locked
+
+
+def collapse_targets(
+    points: Points,
+    quadrics: NDArray[np.float64],
+    edges: NDArray[np.int64],
+    fixed: NDArray[np.bool_],
+) -> tuple[Points, NDArray[np.float64]]:
+    edge_quadrics = quadrics[edges[:, 0]] + quadrics[edges[:, 1]]
+    a, b = points[edges[:, 0]], points[edges[:, 1]]
+    candidates = np.stack((a, b, (a + b) * 0.5), axis=1)
+
+    homogeneous = np.concatenate((candidates, np.ones((*candidates.shape[:2], 1))), axis=2)
+    costs = np.einsum("eci,eij,ecj->ec", homogeneous, edge_quadrics, homogeneous)
+    costs[fixed, 1:] = inf
+    best = np.argmin(costs, axis=1)
+    indices = np.arange(len(edges))
+    return candidates[indices, best], np.maximum(costs[indices, best], 0.0)
+
+
+def independent_edges(point_count: int, edges: NDArray[np.int64], costs: NDArray[np.float64]):
+    # ties are broken by a hash of the edge, as ordering them by index would only rarely
+    # make an edge the cheapest one of both of its vertices
+    tie_breaker = (edges[:, 0] * 2654435761 + edges[:, 1] * 40503) % 4294967291
+    order = np.lexsort((tie_breaker, costs))
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+
+    # an edge is collapsed if it is the cheapest edge of both of its vertices,
+    # so no two edges collapsed in the same pass share a vertex
+    min_rank = np.full(point_count, len(edges), dtype=rank.dtype)
+    np.minimum.at(min_rank, edges[:, 0], rank)
+    np.minimum.at(min_rank, edges[:, 1], rank)
+    selected = (min_rank[edges[:, 0]] == rank) & (min_rank[edges[:, 1]] == rank)
+    return order[selected[order]]
+
+
+def link_condition(
+    point_count: int, triangles: Triangles, edges: NDArray[np.int64]
+) -> NDArray[np.bool_]:
+    # an edge can only be collapsed without pinching the surface if the neighbours its vertices
+    # have in common are the two vertices opposite of it
+    pairs = triangles[:, [[0, 1], [1, 2], [2, 0], [1, 0], [2, 1], [0, 2]]].reshape(-1, 2)
+    keys = np.unique(pairs[:, 0] * point_count + pairs[:, 1])
+    bounds = np.searchsorted(keys, np.arange(point_count + 1) * point_count)
+
+    starts = bounds[edges[:, 0]]
+    counts = bounds[edges[:, 0] + 1] - starts
+    edge_index = np.repeat(np.arange(len(edges)), counts)
+    offsets = np.arange(len(edge_index)) - np.repeat(np.cumsum(counts) - counts, counts)
+    neighbours = keys[np.repeat(starts, counts) + offsets] % point_count
+
+    queries = edges[edge_index, 1] * point_count + neighbours
+    found = keys[np.minimum(np.searchsorted(keys, queries), len(keys) - 1)] == queries
+    return np.bincount(edge_index[found], minlength=len(edges)) == 2
+
+
+def within_component_limits(
+    edge_components: NDArray[np.int64],
+    triangle_counts: NDArray[np.int64],
+    min_triangles: NDArray[np.int64],
+) -> NDArray[np.bool_]:
+    # edges are ordered by cost, the cheapest ones of every component are kept while every
+    # collapse (removing two triangles) keeps the component at its minimum triangle count
+    allowed = np.maximum((triangle_counts - min_triangles) // 2, 0)
+    order = np.argsort(edge_components, kind="stable")
+    sorted_components = edge_components[order]
+    positions = np.empty_like(order)
+    positions[order] = np.arange(len(order)) - np.searchsorted(sorted_components, sorted_components)
+    return positions < allowed[edge_components]
+
+
+def collapse(
+    points: Points, triangles: Triangles, edges: NDArray[np.int64], positions: Points
+) -> tuple[Triangles, Points]:
+    remap = np.arange(len(points))
+    remap[edges[:, 1]] = edges[:, 0]
+    new_points = points.copy()
+    new_points[edges[:, 0]] = positions
+    return remap[triangles], new_points
+
+
+def flipped_triangles(
+    points: Points, triangles: Triangles, new_points: Points, new_triangles: Triangles
+) -> NDArray[np.bool_]:
+    def normals(points: Points, triangles: Triangles):
+        v0, v1, v2 = (points[triangles[:, i]] for i in range(3))
+        return np.cross(v1 - v0, v2 - v0)
+
+    old_normals = normals(points, triangles)
+    dots = np.sum(old_normals * normals(new_points, new_triangles), axis=1)
+    # collapsing a triangle to zero area counts as flipped too, unless it is removed entirely
+    valid = ~degenerate_mask(new_triangles) & np.any(old_normals != 0.0, axis=1)
+    return valid & (dots <= 0.0)
+
+
+def non_manifold_triangles(point_count: int, triangles: Triangles) -> NDArray[np.bool_]:
+    valid = ~degenerate_mask(triangles)
+    edges = np.sort(triangles[valid][:, [[0, 1], [1, 2], [2, 0]]], axis=2)
+    _, inverse, counts = np.unique(
+        edges[..., 0] * point_count + edges[..., 1], return_inverse=True, return_counts=True
+    )
+    non_manifold = np.zeros(len(triangles), dtype=bool)
+    non_manifold[valid] = np.any(counts[inverse.reshape(-1, 3)] > 2, axis=1)
+    return non_manifold
+
+
+def degenerate_mask(triangles: Triangles) -> NDArray[np.bool_]:
+    return (
+        (triangles[:, 0] == triangles[:, 1])
+        | (triangles[:, 1] == triangles[:, 2])
+        | (triangles[:, 2] == triangles[:, 0])
+    )
+
+
+def remove_degenerate(triangles: Triangles) -> Triangles:
+    return triangles[~degenerate_mask(triangles)]
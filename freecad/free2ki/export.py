@@ -0,0 +1,234 @@
+import os
+import sys
+import traceback
+from argparse import ArgumentParser
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from glob import glob
+from multiprocessing import get_context
+from pathlib import Path
+from time import perf_counter
+from typing import NamedTuple
+
+import FreeCAD
+
+from .export_gltf import export_gltf, gltf_path, prefs_use_gltf
+from .export_vrml import (
+    export_vrml,
+    lod_paths,
+    prefs_lod_factors,
+    prefs_use_compression,
+    vrml_path,
+)
+from .objects import get_shape_instances
+from .profiling import ExportProfile, prefs_profile_export
+from .tessellation import SUPPORTS_PARALLEL
+
+SOURCE_SUFFIX = ".FCStd"
+
+
+class ExportResult(NamedTuple):
+    source: Path
+    status: str
+    duration: float
+    message: str = ""
+    # the formatted traceback of failed exports
+    details: str = ""
+
+
+def find_sources(patterns: Iterable[str]):
+    sources: dict[Path, None] = {}
+    for pattern in patterns:
+        if (path := Path(pattern)).is_dir():
+            paths = path.glob(f"**/*{SOURCE_SUFFIX}")
+        else:
+            paths = map(Path, glob(pattern, recursive=True))
+        for source in sorted(paths):
+            if source.suffix.lower() == SOURCE_SUFFIX.lower():
+                sources[source.resolve()] = None
+    return list(sources)
+
+
+def source_root(sources: list[Path]):
+    return Path(os.path.commonpath([source.parent for source in sources]))
+
+
+def output_path(
+    source: Path, output_dir: Path | None, root: Path, use_compression: bool, use_gltf: bool
+):
+    # the directory structure below the common root is kept, so equally named documents from
+    # different directories don't overwrite each other
+    directory = output_dir / source.parent.relative_to(root) if output_dir else source.parent
+    path = directory / source.name
+    return gltf_path(path) if use_gltf else vrml_path(path, use_compression)
+
+
+def is_up_to_date(source: Path, outputs: list[Path]):
+    source_mtime = source.stat().st_mtime
+    return all(output.is_file() and output.stat().st_mtime >= source_mtime for output in outputs)
+
+
+def export_file(
+    source: Path,
+    output: Path,
+    use_compression: bool,
+    use_gltf: bool,
+    force: bool = False,
+    profile: bool | None = None,
+):
+    start = perf_counter()
+    # every level of detail has to be up to date, not only the full resolution model
+    lod_factors = prefs_lod_factors()
+    if not force and is_up_to_date(source, lod_paths(output, lod_factors)):
+        return ExportResult(source, "skipped", perf_counter() - start)
+
+    document = None
+    try:
+        document = FreeCAD.openDocument(str(source), True)
+        if not (objects := get_shape_instances(document.RootObjects)):
+            return ExportResult(source, "empty", perf_counter() - start, "nothing to export")
+        output.parent.mkdir(parents=True, exist_ok=True)
+        export_profile = ExportProfile(prefs_profile_export() if profile is None else profile)
+        if use_gltf:
+            export_gltf(output, objects, workers=1, lod_factors=lod_factors, profile=export_profile)
+        else:
+            export_vrml(
+                output,
+                objects,
+                use_compression=use_compression,
+                workers=1,
+                lod_factors=lod_factors,
+                profile=export_profile,
+            )
+    except Exception as exception:
+        return ExportResult(
+            source, "failed", perf_counter() - start, str(exception), traceback.format_exc()
+        )
+    finally:
+        if document:
+            FreeCAD.closeDocument(document.Name)
+
+    return ExportResult(source, "exported", perf_counter() - start)
+
+
+def export_files(
+    sources: list[Path],
+    output_dir: Path | None = None,
+    use_compression: bool | None = None,
+    jobs: int = 0,
+    force: bool = False,
+    use_gltf: bool | None = None,
+    profile: bool | None = None,
+) -> list[ExportResult]:
+    if not sources:
+        return []
+    if use_compression is None:
+        use_compression = prefs_use_compression()
+    if use_gltf is None:
+        use_gltf = prefs_use_gltf()
+    jobs = min(jobs or os.cpu_count() or 1, len(sources))
+
+    root = source_root(sources)
+    tasks = [
+        (
+            source,
+            output_path(source, output_dir, root, use_compression, use_gltf),
+            use_compression,
+            use_gltf,
+            force,
+            profile,
+        )
+        for source in sources
+    ]
+
+    results: list[ExportResult] = []
+    if jobs <= 1:
+        for task in tasks:
+            results.append(result := export_file(*task))
+            print_result(result)
+        return results
+
+    context = get_context("fork" if SUPPORTS_PARALLEL else "spawn")
+    with ProcessPoolExecutor(jobs, mp_context=context) as executor:
+        futures = [executor.submit(export_file, *task) for task in tasks]
+        for future in as_completed(futures):
+            results.append(result := future.result())
+            print_result(result)
+
+    results.sort(key=lambda result: sources.index(result.source))
+    return results
+
+
+def print_result(result: ExportResult):
+    message = f" ({result.message})" if result.message else ""
+    print(f'info: {result.status} "{result.source.name}" in {result.duration:.2f}s{message}')
+    if result.details:
+        print(result.details, file=sys.stderr)
+
+
+def print_summary(results: list[ExportResult]):
+    if not results:
+        return
+
+    width = max(len(result.source.name) for result in results)
+    print()
+    print(f"{'file':<{width}}  {'status':<8}  {'time':>8}")
+    for result in sorted(results, key=lambda result: result.duration, reverse=True):
+        print(f"{result.source.name:<{width}}  {result.status:<8}  {result.duration:>7.2f}s")
+
+    statuses = [result.status for result in results]
+    total = sum(result.duration for result in results)
+    print(
+        f"\n{statuses.count('exported')} exported, {statuses.count('skipped')} skipped, "
+        f"{statuses.count('failed')} failed ({total:.2f}s total)"
+    )
+
+
+def main(args: list[str] | None = None):
+    parser = ArgumentParser(
+        prog="python -m freecad.free2ki.export",
+        description="Export FreeCAD documents to VRML files for KiCad.",
+    )
+    parser.add_argument("sources", nargs="+", help="FreeCAD documents, directories or globs")
+    parser.add_argument("--out", type=Path, help="output directory (default: next to source)")
+    output_format = parser.add_mutually_exclusive_group()
+    output_format.add_argument(
+        "--wrz", dest="use_compression", action="store_true", default=None, help="write .wrz files"
+    )
+    output_format.add_argument(
+        "--wrl", dest="use_compression", action="store_false", help="write .wrl files"
+    )
+    output_format.add_argument(
+        "--glb", dest="use_gltf", action="store_true", default=None, help="write .glb files"
+    )
+    parser.add_argument("-j", "--jobs", type=int, default=0, help="parallel jobs (default: all)")
+    parser.add_argument("-f", "--force", action="store_true", help="re-export up to date files")
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        default=None,
+        help="write a per stage profile next to every exported file",
+    )
+    parsed = parser.parse_args(args)
+
+    if not (sources := find_sources(parsed.sources)):
+        print("error: no FreeCAD documents found", file=sys.stderr)
+        return 1
+
+    # choosing a VRML variant explicitly overrides the format preference
+    use_gltf = parsed.use_gltf or (False if parsed.use_compression is not None else None)
+    results = export_files(
+        sources,
+        parsed.out,
+        parsed.use_compression,
+        parsed.jobs,
+        parsed.force,
+        use_gltf,
+        parsed.profile,
+    )
+    print_summary(results)
+    return int(any(result.status == "failed" for result in results))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
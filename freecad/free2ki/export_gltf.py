@@ -0,0 +1,339 @@
+import json
+import struct
+from collections.abc import Callable, Sequence
+from concurrent.futures import Executor
+from contextlib import ExitStack
+from math import sqrt
+from pathlib import Path
+from typing import IO, Any
+
+import numpy as np
+from numpy.typing import NDArray
+
+import FreeCAD
+
+from .cache import TessellationCache, prefs_cache_size
+from .decimation import DecimationParameters
+from .export_vrml import (
+    INCH_TO_MM,
+    ExportParts,
+    ExportProgress,
+    InstanceUses,
+    collect_parts,
+    lod_paths,
+    mesh_parts,
+    prefs_decimation_parameters,
+    prefs_export_normals,
+    prefs_lod_factors,
+    prefs_use_compression,
+    prefs_workers,
+    vrml_path,
+    write_vrml,
+)
+from .mat4cad import Material
+from .normals import crease_normals, split_vertices
+from .objects import ShapeInstance
+from .profiling import ExportProfile, prefs_profile_export
+from .tessellation import MeshParameters, Points, Triangles, matrix_array, transform_points
+
+GLB_MAGIC = 0x46546C67
+GLB_VERSION = 2
+GLB_JSON_CHUNK = 0x4E4F534A
+GLB_BIN_CHUNK = 0x004E4942
+
+FLOAT = 5126
+UNSIGNED_INT = 5125
+ARRAY_BUFFER = 34962
+ELEMENT_ARRAY_BUFFER = 34963
+
+# meshes are written in the same 0.1 inch units as the VRML export, the root node converts
+# them to meters and from FreeCAD's Z up to glTF's Y up convention
+UNIT_TO_METERS = 0.001 / INCH_TO_MM
+Z_UP_TO_Y_UP = [-sqrt(0.5), 0.0, 0.0, sqrt(0.5)]
+
+
+def prefs_use_gltf():
+    FSParam: FreeCAD.ParameterGrp = FreeCAD.ParamGet(
+        "User parameter:BaseApp/Preferences/Mod/Free2Ki"
+    )
+    return bool(FSParam.GetInt("ExportFormat", 0) == 1)
+
+
+def gltf_path(path: Path):
+    return path.with_suffix(".glb")
+
+
+def prefs_export_target(path: Path) -> tuple[Path, Callable[..., None]]:
+    if prefs_use_gltf():
+        return gltf_path(path), write_gltf
+    return vrml_path(path, prefs_use_compression()), write_vrml
+
+
+def export_gltf(
+    path: Path,
+    objects: list[ShapeInstance],
+    workers: int | None = None,
+    cache: TessellationCache | None = None,
+    parameters: MeshParameters | None = None,
+    adaptive: bool | None = None,
+    lod_factors: Sequence[float] | None = None,
+    decimation: DecimationParameters | None = None,
+    use_instancing: bool | None = None,
+    export_normals: bool | None = None,
+    triangle_budget: int | None = None,
+    progress: Callable[[ExportProgress], None] | None = None,
+    profile: ExportProfile | None = None,
+):
+    if profile is None:
+        profile = ExportProfile(prefs_profile_export())
+    parts, instance_uses = collect_parts(
+        objects, parameters, adaptive, use_instancing, triangle_budget, profile
+    )
+    write_gltf(
+        path,
+        parts,
+        len(objects),
+        instance_uses,
+        workers,
+        cache,
+        lod_factors,
+        decimation,
+        export_normals,
+        progress,
+        profile,
+    )
+
+
+def write_gltf(
+    path: Path,
+    parts: ExportParts,
+    object_count: int,
+    instance_uses: InstanceUses,
+    workers: int | None = None,
+    cache: TessellationCache | None = None,
+    lod_factors: Sequence[float] | None = None,
+    decimation: DecimationParameters | None = None,
+    export_normals: bool | None = None,
+    progress: Callable[[ExportProgress], None] | None = None,
+    profile: ExportProfile | None = None,
+    executor: Executor | None = None,
+):
+    if workers is None:
+        workers = prefs_workers()
+    if cache is None and prefs_cache_size():
+        cache = TessellationCache()
+    if lod_factors is None:
+        lod_factors = prefs_lod_factors()
+    if decimation is None:
+        decimation = prefs_decimation_parameters()
+    if export_normals is None:
+        export_normals = prefs_export_normals()
+    if profile is None:
+        profile = ExportProfile(prefs_profile_export())
+
+    factors = (1.0, *lod_factors)
+    builders = [GltfBuilder(export_normals) for _ in factors]
+    instance_meshes: list[dict[str, int]] = [{} for _ in factors]
+
+    total = object_count * len(factors)
+    done = 0
+    exported_triangles = [0] * len(factors)
+    for part, level, meshes in mesh_parts(
+        parts, factors, workers, cache, decimation, profile, executor
+    ):
+        builder = builders[level]
+        materials = dict(part.materials)
+        # decimation may leave a material without triangles
+        meshes = [mesh for mesh in meshes if len(mesh[2])]
+        if (instance := part.instance) and meshes:
+            primitives = [
+                (points, triangles, material_id, materials[material_id])
+                for material_id, points, triangles in meshes
+            ]
+            with profile.stage("serialize", part.name):
+                mesh = builder.add_mesh(instance.name, primitives)
+            if mesh is not None:
+                instance_meshes[level][instance.name] = mesh
+                builder.add_node(part.name, mesh, placement_matrix(instance.placement))
+        elif meshes and not instance:
+            with profile.stage("transform", part.name) as stage:
+                primitives = [
+                    (
+                        transform_points(points, part.matrix),
+                        triangles,
+                        material_id,
+                        materials[material_id],
+                    )
+                    for material_id, points, triangles in meshes
+                ]
+                stage.count(0, sum(len(points) for points, *_ in primitives))
+            with profile.stage("serialize", part.name):
+                mesh = builder.add_mesh(part.name, primitives)
+            if mesh is not None:
+                builder.add_node(part.name, mesh)
+        exported_triangles[level] += sum(len(triangles) for _, _, triangles in meshes)
+
+        if progress:
+            done += 1
+            progress(ExportProgress(done, total, part.name, sum(exported_triangles)))
+
+    for builder, meshes in zip(builders, instance_meshes):
+        for name, placement in instance_uses:
+            if (mesh := meshes.get(name)) is not None:
+                builder.add_node(name, mesh, placement_matrix(placement))
+            if progress:
+                done += 1
+                progress(ExportProgress(done, total, name, sum(exported_triangles)))
+
+    paths = lod_paths(path, lod_factors)
+    try:
+        with ExitStack() as stack:
+            for builder, p in zip(builders, paths):
+                with profile.stage("write"):
+                    builder.write(stack.enter_context(open(p, "wb")))
+    except BaseException:
+        for p in paths:
+            p.unlink(missing_ok=True)
+        profile.stop()
+        raise
+
+    print(f"info: exported {' / '.join(map(str, exported_triangles))} triangles")
+    if instance_uses:
+        print(f"info: reused instanced geometry {len(instance_uses)} times")
+
+    if cache:
+        cache.prune()
+
+    profile.finish(path)
+
+
+def placement_matrix(placement: FreeCAD.Placement):
+    return matrix_array(placement.Matrix, scale=INCH_TO_MM)
+
+
+class GltfBuilder:
+    def __init__(self, export_normals: bool = False):
+        self.export_normals = export_normals
+        root = {"name": "Free2Ki", "rotation": Z_UP_TO_Y_UP, "scale": [UNIT_TO_METERS] * 3}
+        self.gltf: dict[str, Any] = {
+            "asset": {"version": "2.0", "generator": "Free2Ki"},
+            "scene": 0,
+            "scenes": [{"nodes": [0]}],
+            "nodes": [root],
+            "meshes": [],
+            "materials": [],
+            "accessors": [],
+            "bufferViews": [],
+        }
+        self.arrays: list[NDArray[Any]] = []
+        self.byte_length = 0
+        self.material_indices: dict[str, int] = {}
+
+    def add_material(self, material_id: str, material: Material):
+        if material_id not in self.material_indices:
+            alpha = 1.0 - material.transparency
+            gltf_material: dict[str, Any] = {
+                "name": material_id,
+                "pbrMetallicRoughness": {
+                    "baseColorFactor": [*material.diffuse[:3], alpha],
+                    # materials only carry the Phong parameters written to VRML files, so they
+                    # are exported as dielectrics with a roughness derived from the shininess
+                    "metallicFactor": 0.0,
+                    "roughnessFactor": 1.0 - material.shininess,
+                },
+                "emissiveFactor": list(material.emission[:3]),
+            }
+            if alpha < 1.0:
+                gltf_material["alphaMode"] = "BLEND"
+            self.material_indices[material_id] = len(self.gltf["materials"])
+            self.gltf["materials"].append(gltf_material)
+        return self.material_indices[material_id]
+
+    def add_accessor(self, array: NDArray[Any], accessor_type: str, target: int):
+        # float32 and uint32 data keeps every buffer view 4 byte aligned
+        array = np.ascontiguousarray(array)
+        self.gltf["bufferViews"].append(
+            {
+                "buffer": 0,
+                "byteOffset": self.byte_length,
+                "byteLength": array.nbytes,
+                "target": target,
+            }
+        )
+        self.arrays.append(array)
+        self.byte_length += array.nbytes
+
+        accessor: dict[str, Any] = {
+            "bufferView": len(self.gltf["bufferViews"]) - 1,
+            "componentType": FLOAT if array.dtype == np.float32 else UNSIGNED_INT,
+            "count": len(array),
+            "type": accessor_type,
+        }
+        if target == ARRAY_BUFFER:
+            accessor["min"] = array.min(axis=0).tolist()
+            accessor["max"] = array.max(axis=0).tolist()
+        self.gltf["accessors"].append(accessor)
+        return len(self.gltf["accessors"]) - 1
+
+    def add_mesh(
+        self, name: str, primitives: list[tuple[Points, Triangles, str, Material]]
+    ) -> int | None:
+        # accessors can't be empty, and neither can the primitives of a mesh
+        gltf_primitives: list[dict[str, Any]] = []
+        for points, triangles, material_id, material in primitives:
+            if not len(triangles):
+                continue
+            attributes: dict[str, int] = {}
+            if self.export_normals:
+                # without normals, glTF viewers have to render the mesh flat shaded
+                normals, normal_index = crease_normals(points, triangles)
+                points, normals, triangles = split_vertices(
+                    points, triangles, normals, normal_index
+                )
+                attributes["NORMAL"] = self.add_accessor(
+                    normals.astype(np.float32), "VEC3", ARRAY_BUFFER
+                )
+            attributes["POSITION"] = self.add_accessor(
+                points.astype(np.float32), "VEC3", ARRAY_BUFFER
+            )
+            gltf_primitives.append(
+                {
+                    "attributes": attributes,
+                    "indices": self.add_accessor(
+                        triangles.astype(np.uint32).reshape(-1), "SCALAR", ELEMENT_ARRAY_BUFFER
+                    ),
+                    "material": self.add_material(material_id, material),
+                }
+            )
+        if not gltf_primitives:
+            return None
+        self.gltf["meshes"].append({"name": name, "primitives": gltf_primitives})
+        return len(self.gltf["meshes"]) - 1
+
+    def add_node(self, name: str, mesh: int, matrix: NDArray[np.float64] | None = None):
+        node: dict[str, Any] = {"name": name, "mesh": mesh}
+        if matrix is not None:
+            # glTF matrices are column major
+            node["matrix"] = matrix.T.reshape(-1).tolist()
+        self.gltf["nodes"][0].setdefault("children", []).append(len(self.gltf["nodes"]))
+        self.gltf["nodes"].append(node)
+
+    def write(self, file: IO[bytes]):
+        if self.byte_length:
+            self.gltf["buffers"] = [{"byteLength": self.byte_length}]
+        # empty arrays aren't allowed by the glTF schema
+        for key in ("meshes", "materials", "accessors", "bufferViews"):
+            if not self.gltf[key]:
+                del self.gltf[key]
+
+        json_chunk = json.dumps(self.gltf, separators=(",", ":")).encode()
+        json_chunk += b" " * (-len(json_chunk) % 4)
+        length = 12 + 8 + len(json_chunk) + (8 + self.byte_length if self.byte_length else 0)
+
+        file.write(struct.pack("<III", GLB_MAGIC, GLB_VERSION, length))
+        file.write(struct.pack("<II", len(json_chunk), GLB_JSON_CHUNK))
+        file.write(json_chunk)
+        if self.byte_length:
+            file.write(struct.pack("<II", self.byte_length, GLB_BIN_CHUNK))
+            for array in self.arrays:
+                file.write(array.data.cast("B"))
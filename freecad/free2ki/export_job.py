@@ -0,0 +1,157 @@
+from collections.abc import Callable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from queue import Empty, Queue
+from threading import Event, Thread
+from time import perf_counter
+from typing import TYPE_CHECKING, Any
+
+import Part
+
+# Qt and QTimer are re-exported for the auto exporter, which only imports Qt when it exports
+if TYPE_CHECKING:
+    from PySide6.QtCore import QObject, Qt as Qt, QTimer as QTimer, Signal
+else:
+    from PySide.QtCore import QObject, Qt as Qt, QTimer as QTimer, Signal
+
+
+from .export_vrml import (
+    ExportCancelled,
+    ExportPart,
+    ExportParts,
+    ExportProgress,
+    InstanceUses,
+    collect_parts,
+    prefs_workers,
+    write_vrml,
+)
+from .objects import ShapeInstance
+from .profiling import ExportProfile, prefs_profile_export
+from .tessellation import MeshParameters, start_workers
+
+# at most this many serialized shapes wait for the job thread, which bounds the memory used
+MAX_QUEUED_PARTS = 16
+# shapes are serialized in batches of about this long, between which the GUI stays responsive
+SERIALIZE_BATCH_SECONDS = 0.02
+QUEUE_FULL_DELAY_MS = 10
+QUEUE_POLL_SECONDS = 0.1
+
+QueuedPart = tuple[ExportPart, str, MeshParameters]
+
+
+class ExportJob(QObject):
+    progressed = Signal(object)
+    finished = Signal(object)
+
+    def __init__(
+        self,
+        path: Path,
+        objects: list[ShapeInstance],
+        writer: Callable[..., None] = write_vrml,
+        **options: Any,
+    ):
+        super().__init__()
+        self.path = path
+        self.writer = writer
+        self.objects = objects
+        self.options = options
+        self.cancelled = Event()
+        self.worker: Thread | None = None
+        self.executor: ProcessPoolExecutor | None = None
+        self.parts: Iterator[tuple[ExportPart, Part.Shape | str, MeshParameters]] = iter(())
+        self.queue: Queue[QueuedPart | BaseException | None] = Queue(MAX_QUEUED_PARTS)
+        self.done = Event()
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.serialize_parts)
+
+    def start(self):
+        # reading the document objects has to happen on the main thread, and so does everything
+        # calling into FreeCAD without releasing the GIL (which would stall the GUI), the
+        # shapes are serialized here in small batches and meshed in worker processes
+        profile = ExportProfile(prefs_profile_export())
+        parts, instance_uses = collect_parts(self.objects, profile=profile)
+        self.parts = iter(parts)
+        self.options.setdefault("profile", profile)
+
+        # forking from the job thread of a multithreaded Qt process could deadlock, so the
+        # workers are started right away, the job thread only submits shapes to them
+        workers = self.options.get("workers")
+        self.executor = start_workers(prefs_workers() if workers is None else workers)
+        if self.executor is None:
+            print("warning: meshing in worker processes is not supported on this platform")
+        self.options.setdefault("executor", self.executor)
+
+        self.worker = Thread(
+            target=self.run, args=(self.queued_parts(), instance_uses), daemon=True
+        )
+        self.worker.start()
+        self.timer.start(0)
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def is_running(self):
+        return self.worker is not None and self.worker.is_alive()
+
+    def run(self, parts: ExportParts, instance_uses: InstanceUses):
+        result: Exception | None = None
+        try:
+            self.writer(
+                self.path,
+                parts,
+                len(self.objects),
+                instance_uses,
+                progress=self.on_progress,
+                **self.options,
+            )
+        except Exception as exception:
+            result = exception
+        finally:
+            self.done.set()
+            if self.executor:
+                self.executor.shutdown(cancel_futures=True)
+        self.finished.emit(result)
+
+    def serialize_parts(self):
+        # runs on the main thread until the queue is full or the batch took long enough, the
+        # instance uses are complete once the parts are exhausted, before the job thread sees
+        # the end of the queue
+        deadline = perf_counter() + SERIALIZE_BATCH_SECONDS
+        while not self.done.is_set():
+            if self.queue.full():
+                self.timer.start(QUEUE_FULL_DELAY_MS)
+                return
+            if perf_counter() > deadline:
+                self.timer.start(0)
+                return
+            try:
+                item = next(self.parts, None)
+                if item is None:
+                    self.queue.put(None)
+                    return
+                part, shape, parameters = item
+                brep = shape if isinstance(shape, str) else shape.exportBrepToString()
+                self.queue.put((part, brep, parameters))
+            except Exception as exception:
+                self.queue.put(exception)
+                return
+
+    def queued_parts(self) -> Iterator[QueuedPart]:
+        while True:
+            try:
+                item = self.queue.get(timeout=QUEUE_POLL_SECONDS)
+            except Empty:
+                if self.cancelled.is_set():
+                    raise ExportCancelled() from None
+                continue
+            if item is None:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+    def on_progress(self, progress: ExportProgress):
+        if self.cancelled.is_set():
+            raise ExportCancelled()
+        self.progressed.emit(progress)
@@ -1,23 +1,49 @@
-import gzip
-from math import radians
+import hashlib
+from collections import Counter
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from concurrent.futures import Executor
+from contextlib import ExitStack
+from math import degrees, isfinite, radians
 from pathlib import Path
+from typing import IO, NamedTuple, cast
 
 import numpy as np
+from numpy.typing import NDArray
 
 import FreeCAD
-import MeshPart
 import Part
 
+from .cache import TessellationCache, prefs_cache_size
+from .catalogue import get_material
+from .compression import DEFAULT_COMPRESSION_LEVEL, DEFAULT_COMPRESSION_THREADS, open_gzip
+from .decimation import DecimationParameters, simplify
 from .mat4cad import Material
+from .normals import CREASE_ANGLE, crease_normals
+from .objects import ShapeInstance
+from .profiling import ExportProfile, prefs_profile_export
+from .props import FREE2KI_PROPS
+from .tessellation import (
+    ANGULAR_DEFLECTION,
+    LINEAR_DEFLECTION,
+    MeshParameters,
+    Points,
+    Triangles,
+    matrix_array,
+    merge_meshes,
+    split_mesh,
+    tessellate,
+    transform_points,
+)
 
 INCH_TO_MM = 1.0 / 2.54
 
+DEFAULT_PRECISION = 6
+NORMAL_PRECISION = 4
+SERIALIZE_CHUNK_SIZE = 1 << 14
+ROW_SEPARATOR = ", "
 
-class FREE2KI_PROPS:
-    MATERIALS = "Free2KiMaterials"
-    MATERIAL_INDICES = "Free2KiMaterialIndices"
-
-    ALL = {MATERIALS, MATERIAL_INDICES}
+# in adaptive mode, the deflection preferences apply to a part with this bounding box diagonal
+ADAPTIVE_REFERENCE_SIZE = 10.0
 
 
 def prefs_use_compression():
@@ -27,88 +53,717 @@ def prefs_use_compression():
     return bool(FSParam.GetInt("VRMLCompression", 0) == 0)
 
 
-def export_vrml(path: Path, objects: list[FreeCAD.GeoFeature], use_compression: bool | None = None):
+def prefs_compression_level() -> int:
+    FSParam: FreeCAD.ParameterGrp = FreeCAD.ParamGet(
+        "User parameter:BaseApp/Preferences/Mod/Free2Ki"
+    )
+    return FSParam.GetInt("VRMLCompressionLevel", DEFAULT_COMPRESSION_LEVEL)
+
+
+def prefs_compression_threads() -> int:
+    FSParam: FreeCAD.ParameterGrp = FreeCAD.ParamGet(
+        "User parameter:BaseApp/Preferences/Mod/Free2Ki"
+    )
+    return FSParam.GetInt("VRMLCompressionThreads", DEFAULT_COMPRESSION_THREADS)
+
+
+def prefs_precision() -> int:
+    FSParam: FreeCAD.ParameterGrp = FreeCAD.ParamGet(
+        "User parameter:BaseApp/Preferences/Mod/Free2Ki"
+    )
+    return FSParam.GetInt("VRMLPrecision", DEFAULT_PRECISION)
+
+
+def prefs_workers() -> int:
+    FSParam: FreeCAD.ParameterGrp = FreeCAD.ParamGet(
+        "User parameter:BaseApp/Preferences/Mod/Free2Ki"
+    )
+    return FSParam.GetInt("ExportWorkers", 1)
+
+
+def prefs_mesh_parameters():
+    FSParam: FreeCAD.ParameterGrp = FreeCAD.ParamGet(
+        "User parameter:BaseApp/Preferences/Mod/Free2Ki"
+    )
+    return MeshParameters(
+        FSParam.GetFloat("LinearDeflection", LINEAR_DEFLECTION),
+        radians(FSParam.GetFloat("AngularDeflection", degrees(ANGULAR_DEFLECTION))),
+    )
+
+
+def prefs_triangle_budget() -> int:
+    FSParam: FreeCAD.ParameterGrp = FreeCAD.ParamGet(
+        "User parameter:BaseApp/Preferences/Mod/Free2Ki"
+    )
+    return FSParam.GetInt("TriangleBudget", 0)
+
+
+def prefs_adaptive_quality():
+    FSParam: FreeCAD.ParameterGrp = FreeCAD.ParamGet(
+        "User parameter:BaseApp/Preferences/Mod/Free2Ki"
+    )
+    return bool(FSParam.GetInt("TessellationMode", 0) == 1)
+
+
+def prefs_use_instancing() -> bool:
+    FSParam: FreeCAD.ParameterGrp = FreeCAD.ParamGet(
+        "User parameter:BaseApp/Preferences/Mod/Free2Ki"
+    )
+    return FSParam.GetBool("UseInstancing", False)
+
+
+def prefs_merge_materials() -> bool:
+    FSParam: FreeCAD.ParameterGrp = FreeCAD.ParamGet(
+        "User parameter:BaseApp/Preferences/Mod/Free2Ki"
+    )
+    return FSParam.GetBool("MergeByMaterial", False)
+
+
+def prefs_export_normals() -> bool:
+    FSParam: FreeCAD.ParameterGrp = FreeCAD.ParamGet(
+        "User parameter:BaseApp/Preferences/Mod/Free2Ki"
+    )
+    return FSParam.GetBool("ExportNormals", False)
+
+
+def prefs_decimation_parameters():
+    FSParam: FreeCAD.ParameterGrp = FreeCAD.ParamGet(
+        "User parameter:BaseApp/Preferences/Mod/Free2Ki"
+    )
+    return DecimationParameters(
+        FSParam.GetFloat("WeldTolerance", 0.0),
+        FSParam.GetInt("DecimationRatio", 100) / 100,
+        FSParam.GetFloat("DecimationMaxError", 0.0),
+    )
+
+
+def prefs_lod_factors():
+    FSParam: FreeCAD.ParameterGrp = FreeCAD.ParamGet(
+        "User parameter:BaseApp/Preferences/Mod/Free2Ki"
+    )
+    return parse_lod_factors(FSParam.GetString("LODFactors", ""))
+
+
+def parse_lod_factors(text: str):
+    factors: list[float] = []
+    for value in text.replace(";", ",").split(","):
+        if not (value := value.strip()):
+            continue
+        try:
+            factor = float(value)
+        except ValueError:
+            factor = None
+        # the factors scale the deflections and divide the triangle budget
+        if factor is None or not isfinite(factor) or factor <= 0.0:
+            print(f'warning: ignoring invalid level of detail factor "{value}"')
+            continue
+        factors.append(factor)
+    return factors
+
+
+def vrml_path(path: Path, use_compression: bool):
+    return path.with_suffix(".wrz" if use_compression else ".wrl")
+
+
+def lod_paths(path: Path, lod_factors: Sequence[float]):
+    return [
+        path,
+        *(
+            path.with_name(f"{path.stem}_lod{i}{path.suffix}")
+            for i in range(1, len(lod_factors) + 1)
+        ),
+    ]
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+class ExportProgress(NamedTuple):
+    done: int
+    total: int
+    name: str
+    triangles: int
+
+
+# shapes may be serialized to BREP strings already, see ExportJob
+ExportParts = Iterable[tuple["ExportPart", Part.Shape | str, MeshParameters]]
+InstanceUses = list[tuple[str, FreeCAD.Placement]]
+
+
+def export_vrml(
+    path: Path,
+    objects: list[ShapeInstance],
+    use_compression: bool | None = None,
+    precision: int | None = None,
+    workers: int | None = None,
+    cache: TessellationCache | None = None,
+    parameters: MeshParameters | None = None,
+    adaptive: bool | None = None,
+    lod_factors: Sequence[float] | None = None,
+    decimation: DecimationParameters | None = None,
+    use_instancing: bool | None = None,
+    merge_materials: bool | None = None,
+    export_normals: bool | None = None,
+    triangle_budget: int | None = None,
+    progress: Callable[[ExportProgress], None] | None = None,
+    profile: ExportProfile | None = None,
+    compression_level: int | None = None,
+    compression_threads: int | None = None,
+):
+    if profile is None:
+        profile = ExportProfile(prefs_profile_export())
+    parts, instance_uses = collect_parts(
+        objects, parameters, adaptive, use_instancing, triangle_budget, profile
+    )
+    write_vrml(
+        path,
+        parts,
+        len(objects),
+        instance_uses,
+        use_compression,
+        precision,
+        workers,
+        cache,
+        lod_factors,
+        decimation,
+        merge_materials,
+        export_normals,
+        progress,
+        profile,
+        compression_level,
+        compression_threads,
+    )
+
+
+def collect_parts(
+    objects: list[ShapeInstance],
+    parameters: MeshParameters | None = None,
+    adaptive: bool | None = None,
+    use_instancing: bool | None = None,
+    triangle_budget: int | None = None,
+    profile: ExportProfile | None = None,
+) -> tuple[ExportParts, InstanceUses]:
+    if parameters is None:
+        parameters = prefs_mesh_parameters()
+    if adaptive is None:
+        adaptive = prefs_adaptive_quality()
+    if use_instancing is None:
+        use_instancing = prefs_use_instancing()
+    if triangle_budget is None:
+        triangle_budget = prefs_triangle_budget()
+
+    instance_uses: InstanceUses = []
+    parts = export_parts(
+        objects, parameters, adaptive, instance_uses, use_instancing, triangle_budget, profile
+    )
+    return parts, instance_uses
+
+
+def write_vrml(
+    path: Path,
+    parts: ExportParts,
+    object_count: int,
+    instance_uses: InstanceUses,
+    use_compression: bool | None = None,
+    precision: int | None = None,
+    workers: int | None = None,
+    cache: TessellationCache | None = None,
+    lod_factors: Sequence[float] | None = None,
+    decimation: DecimationParameters | None = None,
+    merge_materials: bool | None = None,
+    export_normals: bool | None = None,
+    progress: Callable[[ExportProgress], None] | None = None,
+    profile: ExportProfile | None = None,
+    compression_level: int | None = None,
+    compression_threads: int | None = None,
+    executor: Executor | None = None,
+):
     if use_compression is None:
         use_compression = prefs_use_compression()
-    _open = gzip.open if use_compression else open
+    if precision is None:
+        precision = prefs_precision()
+    if workers is None:
+        workers = prefs_workers()
+    if cache is None and prefs_cache_size():
+        cache = TessellationCache()
+    if lod_factors is None:
+        lod_factors = prefs_lod_factors()
+    if decimation is None:
+        decimation = prefs_decimation_parameters()
+    if merge_materials is None:
+        merge_materials = prefs_merge_materials()
+    if export_normals is None:
+        export_normals = prefs_export_normals()
+    if profile is None:
+        profile = ExportProfile(prefs_profile_export())
+    if compression_level is None:
+        compression_level = prefs_compression_level()
+    if compression_threads is None:
+        compression_threads = prefs_compression_threads()
 
-    with _open(str(path), "wb") as file:
+    def _open(path: Path) -> IO[bytes]:
+        if use_compression:
+            # the gzip files are only ever written to
+            return cast(IO[bytes], open_gzip(path, compression_level, compression_threads))
+        return open(path, "wb")
+
+    # with compression, writing includes the time spent compressing (or, with several threads,
+    # waiting for the compression to catch up)
+    write_stage = "compress" if use_compression else "write"
+
+    factors = (1.0, *lod_factors)
+    paths = lod_paths(path, lod_factors)
+    triangle_counts: dict[str, list[int]] = {}
+    try:
+        with ExitStack() as stack:
+            files = [profile.wrap(stack.enter_context(_open(p)), write_stage) for p in paths]
+            write_levels(
+                files,
+                parts,
+                object_count,
+                instance_uses,
+                factors,
+                precision,
+                workers,
+                cache,
+                decimation,
+                merge_materials,
+                export_normals,
+                triangle_counts,
+                profile,
+                executor,
+                progress,
+            )
+    except BaseException:
+        # don't leave truncated files behind on errors or cancellation
+        for p in paths:
+            p.unlink(missing_ok=True)
+        profile.stop()
+        raise
+
+    for name, counts in triangle_counts.items():
+        print(f'info: "{name}": {" / ".join(map(str, counts))} triangles')
+    totals = (
+        sum(counts[level] for counts in triangle_counts.values()) for level in range(len(factors))
+    )
+    print(f"info: exported {' / '.join(map(str, totals))} triangles")
+
+    if instance_uses:
+        print(f"info: reused instanced geometry {len(instance_uses)} times")
+
+    if cache:
+        cache.prune()
+
+    profile.finish(path)
+
+
+def write_levels(
+    files: list[IO[bytes]],
+    parts: ExportParts,
+    object_count: int,
+    instance_uses: InstanceUses,
+    factors: Sequence[float],
+    precision: int,
+    workers: int,
+    cache: TessellationCache | None,
+    decimation: DecimationParameters,
+    merge_materials: bool,
+    export_normals: bool,
+    triangle_counts: dict[str, list[int]],
+    profile: ExportProfile,
+    executor: Executor | None = None,
+    progress: Callable[[ExportProgress], None] | None = None,
+):
+    for file in files:
         file.write(VRML_HEADER.encode())
 
-        points_list = []
-        triangles_list = []
-        material_ids = []
-        for obj in objects:
-            name = getattr(obj, "_Body", obj).Label
-            print(f'info: exporting "{name}"')
+    written_material_ids: list[set[str]] = [set() for _ in files]
+    # with merge_materials, non instanced geometry is collected and written per material at the end
+    merged_meshes: list[dict[str, list[tuple[Points, Triangles]]]] = [{} for _ in files]
 
-            assert (shape := obj.getPropertyOfGeometry())
+    def write_material(level: int, material_id: str, material: Material):
+        if material_id not in written_material_ids[level]:
+            material_string = MATERIAL_FORMAT.format(name=material_id, m=material)
+            files[level].write(SHAPE_FORMAT.format(material_string).encode())
+            written_material_ids[level].add(material_id)
 
-            obj_material_ids = ["default"]
-            materials = [Material()]
-            material_indices = np.zeros(len(shape.Faces), dtype=int)
-
-            if hasattr(obj, FREE2KI_PROPS.MATERIALS):
-                if (ids := getattr(obj, FREE2KI_PROPS.MATERIALS)) in ([], [""]):
-                    print(f"warning: {name}.{FREE2KI_PROPS.MATERIALS} is empty")
-                elif not (indices := getattr(obj, FREE2KI_PROPS.MATERIAL_INDICES)):
-                    print(f"warning: {name}.{FREE2KI_PROPS.MATERIAL_INDICES} is empty")
-                else:
-                    obj_material_ids = ids
-                    materials = [
-                        mat if (mat := Material.from_name(name)) else Material()
-                        for name in obj_material_ids
-                    ]
-                    material_indices = np.array(indices)
-
-            elif hasattr(obj, "ViewObject") and obj.ViewObject:
-                obj_material_ids = [name]
-                view = obj.ViewObject
-                assert (color := getattr(view, "ShapeColor"))
-                assert (transparency := getattr(view, "Transparency"))
-                materials = [Material(diffuse=color, alpha=1.0 - transparency)]
-
-            for material_id, material in zip(obj_material_ids, materials):
-                if material_id not in material_ids:
-                    material_string = MATERIAL_FORMAT.format(name=material_id, m=material)
-                    file.write(SHAPE_FORMAT.format(material_string).encode())
-                material_ids.append(material_id)
+    total = object_count * len(factors)
+    done = 0
+    exported_triangles = 0
+    for part, level, meshes in mesh_parts(
+        parts, factors, workers, cache, decimation, profile, executor
+    ):
+        file = files[level]
+        for material_id, material in part.materials:
+            write_material(level, material_id, material)
+        if instance := part.instance:
+            write_transform_begin(file, instance.placement)
+            file.write(GROUP_DEF_BEGIN_FORMAT.format(name=instance.name).encode())
 
-            global_matrix = obj.getGlobalPlacement().Matrix * obj.Placement.Matrix.inverse()
-            global_matrix.scale(INCH_TO_MM, INCH_TO_MM, INCH_TO_MM)
+        for material_id, points, triangles in meshes:
+            if not instance:
+                with profile.stage("transform", part.name) as stage:
+                    points = transform_points(points, part.matrix)
+                    stage.count(0, len(points))
+            if merge_materials and not instance:
+                merged_meshes[level].setdefault(material_id, []).append((points, triangles))
+            else:
+                with profile.stage("serialize", part.name) as stage:
+                    write_mesh(file, points, triangles, material_id, precision, export_normals)
+                    stage.count(len(triangles), len(points))
+            triangle_counts.setdefault(part.name, [0] * len(files))[level] += len(triangles)
+            exported_triangles += len(triangles)
+
+        if instance:
+            file.write(GROUP_END.encode())
+            file.write(TRANSFORM_END.encode())
+
+        if progress:
+            done += 1
+            progress(ExportProgress(done, total, part.name, exported_triangles))
+
+    for file, meshes in zip(files, merged_meshes):
+        for material_id, material_meshes in meshes.items():
+            with profile.stage("serialize", f"merged {material_id}") as stage:
+                points, triangles = merge_meshes(material_meshes)
+                write_mesh(file, points, triangles, material_id, precision, export_normals)
+                stage.count(len(triangles), len(points))
+
+    for file in files:
+        for name, placement in instance_uses:
+            write_transform_begin(file, placement)
+            file.write(USE_FORMAT.format(name=name).encode())
+            file.write(TRANSFORM_END.encode())
+            if progress:
+                done += 1
+                progress(ExportProgress(done, total, name, exported_triangles))
 
-            faces = np.array(shape.Faces)
-            for i, material_id in enumerate(obj_material_ids):
-                face_indices = np.nonzero(material_indices == i)[0]
-                face_indices = np.extract(face_indices < len(shape.Faces), face_indices)
-                compound = Part.makeCompound(faces[face_indices]).cleaned()
 
-                mesh = MeshPart.meshFromShape(
-                    Shape=compound, LinearDeflection=0.01, AngularDeflection=radians(20)
+def mesh_parts(
+    parts: ExportParts,
+    factors: Sequence[float],
+    workers: int,
+    cache: TessellationCache | None,
+    decimation: DecimationParameters,
+    profile: ExportProfile | None = None,
+    executor: Executor | None = None,
+) -> Iterator[tuple["ExportPart", int, list[tuple[str, Points, Triangles]]]]:
+    if profile is None:
+        profile = ExportProfile()
+    level_parts = (
+        ((part, level), shape, part_parameters.scaled(factor))
+        for part, shape, part_parameters in parts
+        for level, factor in enumerate(factors)
+    )
+    results = tessellate(level_parts, workers, cache, executor)
+    while True:
+        # with several workers, this is the time spent waiting for the next finished mesh
+        with profile.stage("mesh") as stage:
+            if (result := next(results, None)) is None:
+                stage.discard = True
+                break
+            (part, level), points, triangles, faces = result
+            stage.obj = part.name
+            stage.count(len(triangles), len(points))
+
+        meshes: list[tuple[str, Points, Triangles]] = []
+        with profile.stage("split", part.name):
+            # triangles that belong to no shape face get no material and are dropped, indexing
+            # with their -1 would give them the material of the last face instead
+            face_materials = np.where(faces >= 0, part.face_materials[faces], -1)
+            groups = split_mesh(points, triangles, face_materials, len(part.materials))
+        for (material_id, _), (points, triangles) in zip(part.materials, groups):
+            if not len(triangles):
+                continue
+
+            if decimation.enabled:
+                counts = (len(points), len(triangles))
+                with profile.stage("decimate", part.name) as stage:
+                    points, triangles = simplify(points, triangles, decimation)
+                    stage.count(len(triangles), len(points))
+                print(
+                    f'info: simplified "{part.name}" ({material_id}): '
+                    f"{counts[0]} -> {len(points)} vertices, "
+                    f"{counts[1]} -> {len(triangles)} triangles"
                 )
-                points = [global_matrix * point.Vector for point in mesh.Points]
-                triangles = [facet.PointIndices for facet in mesh.Facets]
-                points_list.append(points)
-                triangles_list.append(triangles)
-
-        for points, triangles, material_id in zip(points_list, triangles_list, material_ids):
-            points_str = ", ".join(f"{v[0]:g} {v[1]:g} {v[2]:g}" for v in points)
-            indices_str = ", ".join(f"{t[0]},{t[1]},{t[2]},-1" for t in triangles)
-            file.write(
-                SHAPE_FORMAT.format(
-                    MESH_FORMAT.format(
-                        points=points_str,
-                        indices=indices_str,
-                        material_id=material_id,
-                        crease_angle=radians(30),
-                    )
-                ).encode()
-            )
+            meshes.append((material_id, points, triangles))
+        yield part, level, meshes
+
+
+class Instance(NamedTuple):
+    name: str
+    placement: FreeCAD.Placement
+
+
+class ExportPart(NamedTuple):
+    name: str
+    materials: list[tuple[str, Material]]
+    face_materials: NDArray[np.int64]
+    matrix: NDArray[np.float64]
+    instance: Instance | None = None
+
+
+def export_parts(
+    instances: list[ShapeInstance],
+    parameters: MeshParameters = MeshParameters(),
+    adaptive: bool = False,
+    instance_uses: InstanceUses | None = None,
+    use_instancing: bool = False,
+    triangle_budget: int = 0,
+    profile: ExportProfile | None = None,
+) -> Iterator[tuple[ExportPart, Part.Shape, MeshParameters]]:
+    if profile is None:
+        profile = ExportProfile()
+    objects = [instance.obj for instance in instances]
+
+    # objects placed several times by links are always instanced
+    instance_names: dict[FreeCAD.GeoFeature, str] = {}
+    if instance_uses is not None:
+        instance_names = find_instances(objects, parameters, adaptive, use_instancing)
+    defined_instances: set[str] = set()
+
+    object_budgets: dict[FreeCAD.GeoFeature, int] = {}
+    if triangle_budget > 0:
+        object_budgets = split_triangle_budget(objects, parameters, instance_names, triangle_budget)
+
+    for obj, link_matrix in instances:
+        name = getattr(obj, "_Body", obj).Label
+        assert (shape := obj.getPropertyOfGeometry())
+
+        if link_matrix is None:
+            global_matrix = obj.getGlobalPlacement().Matrix * obj.Placement.Matrix.inverse()
+        else:
+            # links place the source geometry, instead of its own placement
+            global_matrix = link_matrix * shape.Placement.Matrix.inverse()
+
+        # shapes are meshed without their placement, so moving an object keeps its cache entry
+        global_matrix = global_matrix * shape.Placement.Matrix
+
+        instance = None
+        if instance_name := instance_names.get(obj):
+            instance = Instance(instance_name, FreeCAD.Placement(global_matrix))
+            if instance_name in defined_instances:
+                assert instance_uses is not None
+                instance_uses.append(instance)
+                continue
+            defined_instances.add(instance_name)
+        shape = local_shape(shape)
+
+        print(f'info: exporting "{name}"')
+
+        obj_material_ids = ["default"]
+        materials = [Material()]
+        material_indices = np.zeros(len(shape.Faces), dtype=int)
+
+        if hasattr(obj, FREE2KI_PROPS.MATERIALS):
+            if (ids := getattr(obj, FREE2KI_PROPS.MATERIALS)) in ([], [""]):
+                print(f"warning: {name}.{FREE2KI_PROPS.MATERIALS} is empty")
+            elif not (indices := getattr(obj, FREE2KI_PROPS.MATERIAL_INDICES)):
+                print(f"warning: {name}.{FREE2KI_PROPS.MATERIAL_INDICES} is empty")
+            else:
+                obj_material_ids = ids
+                materials = [
+                    mat if (mat := get_material(name)) else Material() for name in obj_material_ids
+                ]
+                material_indices = np.array(indices)
+
+        elif hasattr(obj, "ViewObject") and obj.ViewObject:
+            obj_material_ids = [name]
+            view = obj.ViewObject
+            assert (color := getattr(view, "ShapeColor"))
+            assert (transparency := getattr(view, "Transparency"))
+            materials = [Material(diffuse=color, alpha=1.0 - transparency)]
+
+        matrix = matrix_array(global_matrix, scale=INCH_TO_MM)
+
+        # faces without a valid material index are not exported
+        face_materials = np.full(len(shape.Faces), -1, dtype=np.int64)
+        material_indices = material_indices[: len(face_materials)]
+        face_materials[: len(material_indices)] = np.where(
+            material_indices < len(materials), material_indices, -1
+        )
+
+        with profile.stage("clean", name):
+            shape = shape.cleaned()
+        shape_parameters = object_mesh_parameters(obj, parameters)
+        if adaptive:
+            shape_parameters = adaptive_mesh_parameters(shape, shape_parameters)
+        if obj in object_budgets:
+            shape_parameters = shape_parameters._replace(triangle_budget=object_budgets[obj])
+
+        part = ExportPart(
+            name, list(zip(obj_material_ids, materials)), face_materials, matrix, instance
+        )
+        yield part, shape, shape_parameters
+
+
+def split_triangle_budget(
+    objects: list[FreeCAD.GeoFeature],
+    parameters: MeshParameters,
+    instance_names: dict[FreeCAD.GeoFeature, str],
+    triangle_budget: int,
+) -> dict[FreeCAD.GeoFeature, int]:
+    # objects with their own budget keep it, the rest of the file budget is split by surface area,
+    # instanced geometry is only written (and counted) once
+    areas: dict[FreeCAD.GeoFeature | str, float] = {}
+    for obj in objects:
+        if (key := instance_names.get(obj, obj)) in areas:
+            continue
+        if own_budget := object_mesh_parameters(obj, parameters).triangle_budget:
+            triangle_budget -= own_budget
+            areas[key] = 0.0
+        else:
+            assert (shape := obj.getPropertyOfGeometry())
+            areas[key] = shape.Area
+
+    if triangle_budget <= 0:
+        print("warning: object triangle budgets exceed the file triangle budget")
+    if (total_area := sum(areas.values())) <= 0.0:
+        return {}
+
+    # a budget of 0 means unlimited, so always allow at least one triangle
+    return {
+        obj: max(int(triangle_budget * area / total_area), 1)
+        for obj in objects
+        if (area := areas[instance_names.get(obj, obj)]) > 0.0
+    }
+
+
+def find_instances(
+    objects: list[FreeCAD.GeoFeature],
+    parameters: MeshParameters,
+    adaptive: bool,
+    by_geometry: bool = True,
+) -> dict[FreeCAD.GeoFeature, str]:
+    # objects can occur several times (through links), their geometry is only keyed once
+    keys = {
+        obj: geometry_key(obj, parameters, adaptive) if by_geometry else obj.FullName
+        for obj in dict.fromkeys(objects)
+    }
+    repeated = [key for key, count in Counter(keys[obj] for obj in objects).items() if count > 1]
+    names = {key: f"Free2KiInstance{i}" for i, key in enumerate(repeated)}
+    return {obj: names[key] for obj, key in keys.items() if key in names}
+
+
+def geometry_key(obj: FreeCAD.GeoFeature, parameters: MeshParameters, adaptive: bool):
+    assert (shape := obj.getPropertyOfGeometry())
+    digest = hashlib.sha256(local_shape(shape).exportBrepToString().encode())
+
+    materials = getattr(obj, FREE2KI_PROPS.MATERIALS, None)
+    material_indices = getattr(obj, FREE2KI_PROPS.MATERIAL_INDICES, None)
+    appearance = None
+    if materials is None and (view := getattr(obj, "ViewObject", None)):
+        appearance = (obj.Label, view.ShapeColor, view.Transparency)
+    mesh_parameters = object_mesh_parameters(obj, parameters)
+
+    digest.update(repr((materials, material_indices, appearance)).encode())
+    digest.update(repr((*mesh_parameters, adaptive)).encode())
+    return digest.hexdigest()
+
+
+def local_shape(shape: Part.Shape) -> Part.Shape:
+    shape = shape.copy()
+    shape.Placement = FreeCAD.Placement()
+    return shape
+
+
+def object_mesh_parameters(obj: FreeCAD.GeoFeature, parameters: MeshParameters):
+    linear_deflection, angular_deflection, triangle_budget = parameters
+    if (value := getattr(obj, FREE2KI_PROPS.LINEAR_DEFLECTION, None)) is not None:
+        linear_deflection = float(value)
+    if (value := getattr(obj, FREE2KI_PROPS.ANGULAR_DEFLECTION, None)) is not None:
+        angular_deflection = radians(float(value))
+    if (value := getattr(obj, FREE2KI_PROPS.TRIANGLE_BUDGET, None)) is not None:
+        triangle_budget = int(value)
+    return MeshParameters(linear_deflection, angular_deflection, triangle_budget)
+
+
+def adaptive_mesh_parameters(shape: Part.Shape, parameters: MeshParameters):
+    if not (size := shape.BoundBox.DiagonalLength):
+        return parameters
+    scale = size / ADAPTIVE_REFERENCE_SIZE
+    return parameters._replace(linear_deflection=parameters.linear_deflection * scale)
+
+
+def write_transform_begin(file: IO[bytes], placement: FreeCAD.Placement):
+    rotation = placement.Rotation
+    file.write(
+        TRANSFORM_BEGIN_FORMAT.format(
+            translation=placement.Base * INCH_TO_MM,
+            axis=rotation.Axis,
+            angle=rotation.Angle,
+            scale=INCH_TO_MM,
+        ).encode()
+    )
+
+
+def write_mesh(
+    file: IO[bytes],
+    points: Points,
+    triangles: Triangles,
+    material_id: str,
+    precision: int = DEFAULT_PRECISION,
+    export_normals: bool = False,
+):
+    file.write(SHAPE_BEGIN.encode())
+    file.write(MESH_BEGIN_FORMAT.format(crease_angle=CREASE_ANGLE).encode())
+    write_indices(file, triangles)
+    if export_normals:
+        # normals are computed from the final points, so they're already transformed
+        normals, normal_index = crease_normals(points, triangles)
+        file.write(MESH_NORMAL.encode())
+        write_points(file, normals, NORMAL_PRECISION)
+        file.write(MESH_NORMAL_INDEX.encode())
+        write_indices(file, normal_index)
+    file.write(MESH_COORD.encode())
+    write_points(file, points, precision)
+    file.write(MESH_END_FORMAT.format(material_id=material_id).encode())
+    file.write(SHAPE_END.encode())
+
+
+def write_points(file: IO[bytes], points: NDArray[np.floating], precision: int = DEFAULT_PRECISION):
+    component_format = f"%.{precision}g"
+    write_rows(file, points, " ".join((component_format,) * 3))
+
+
+def write_indices(file: IO[bytes], triangles: NDArray[np.integer]):
+    write_rows(file, triangles, "%d,%d,%d,-1")
+
+
+def write_rows(file: IO[bytes], array: NDArray[np.number], row_format: str):
+    for start in range(0, len(array), SERIALIZE_CHUNK_SIZE):
+        chunk = array[start : start + SERIALIZE_CHUNK_SIZE]
+        if start:
+            file.write(ROW_SEPARATOR.encode())
+        chunk_format = ROW_SEPARATOR.join((row_format,) * len(chunk))
+        file.write((chunk_format % tuple(chunk.ravel().tolist())).encode())
 
 
 VRML_HEADER = "#VRML V2.0 utf8\n"
 
 SHAPE_FORMAT = "Shape\n{{\n{}}}\n"
+SHAPE_BEGIN = "Shape\n{\n"
+SHAPE_END = "}\n"
+
+TRANSFORM_BEGIN_FORMAT = (
+    ""
+    "Transform\n"
+    "{{\n"
+    "    translation {translation.x:.9g} {translation.y:.9g} {translation.z:.9g}\n"
+    "    rotation {axis.x:.9g} {axis.y:.9g} {axis.z:.9g} {angle:.9g}\n"
+    "    scale {scale:.9g} {scale:.9g} {scale:.9g}\n"
+    "    children\n"
+    "    [\n"
+)
+
+TRANSFORM_END = "    ]\n}\n"
+
+GROUP_DEF_BEGIN_FORMAT = "DEF {name} Group\n{{\n    children\n    [\n"
+
+GROUP_END = "    ]\n}\n"
+
+USE_FORMAT = "USE {name}\n"
 
 MATERIAL_FORMAT = (
     ""
@@ -126,15 +781,23 @@ MATERIAL_FORMAT = (
     "    }}\n"
 )
 
-MESH_FORMAT = (
+MESH_BEGIN_FORMAT = (
     ""
     "    geometry IndexedFaceSet\n"
     "    {{\n"
     "        creaseAngle {crease_angle:.4g}\n"
-    "        coordIndex [{indices}]\n"
-    "        coord Coordinate\n"
-    "        {{\n"
-    "            point[{points}]\n"
+    "        coordIndex ["
+)
+
+MESH_NORMAL = "]\n        normal Normal\n        {\n            vector["
+
+MESH_NORMAL_INDEX = "]\n        }\n        normalIndex ["
+
+MESH_COORD = "]\n        coord Coordinate\n        {\n            point["
+
+MESH_END_FORMAT = (
+    ""
+    "]\n"
     "        }}\n"
     "    }}\n"
     "    appearance Appearance\n"
@@ -1,8 +1,10 @@
 from pathlib import Path
 
+import FreeCAD
 import FreeCADGui as Gui
 
-from .commands import register_commands
+from .auto_export import AutoExporter
+from .registry import register_commands
 
 BASE_DIR = Path(__file__).parent.resolve()
 ICONS_DIR = BASE_DIR / "icons"
@@ -14,12 +16,16 @@ class Free2KiWorkbench(Gui.Workbench):
     Icon = str(ICONS_DIR / "kicad-export.png")
 
     def Initialize(self):
-        cmds = register_commands()
+        cmds, menu_cmds = register_commands()
         self.appendToolbar("Free2Ki Tools", cmds)
-        self.appendMenu("Free2Ki Tools", cmds)
+        self.appendMenu("Free2Ki Tools", menu_cmds)
 
         Gui.addPreferencePage(str(BASE_DIR / "preferences.ui"), "Free2Ki")
         Gui.addIconPath(str(ICONS_DIR))
 
 
 Gui.addWorkbench(Free2KiWorkbench())
+
+# saves are observed from startup on, not only after the workbench was first activated
+AUTO_EXPORTER = AutoExporter()
+FreeCAD.addDocumentObserver(AUTO_EXPORTER)
@@ -0,0 +1,76 @@
+from math import cos, radians
+
+import numpy as np
+from numpy.typing import NDArray
+
+from .tessellation import Points, Triangles
+
+CREASE_ANGLE = radians(30)
+NORMAL_DECIMALS = 6
+
+Normals = NDArray[np.float64]
+
+
+def crease_normals(
+    points: Points, triangles: Triangles, crease_angle: float = CREASE_ANGLE
+) -> tuple[Normals, Triangles]:
+    # smooths across edges like a VRML viewer would for an IndexedFaceSet with this creaseAngle,
+    # returns the unique normals and a normal index per triangle corner
+    if not len(triangles):
+        return np.zeros((0, 3)), np.zeros((0, 3), dtype=np.int64)
+
+    a, b, c = points[triangles].transpose(1, 0, 2)
+    # the cross product length is twice the triangle area, so larger triangles weigh more
+    face_normals = np.cross(b - a, c - a)
+    unit_normals = normalized(face_normals)
+
+    # pair every triangle corner with all corners (including itself) sharing the same vertex
+    order = np.argsort(triangles.reshape(-1), kind="stable")
+    faces = order // 3
+    _, starts, counts = np.unique(
+        triangles.reshape(-1)[order], return_index=True, return_counts=True
+    )
+    pair_counts = np.repeat(counts, counts)
+    pair_starts = np.cumsum(pair_counts) - pair_counts
+    first = np.repeat(np.arange(len(order)), pair_counts)
+    second = np.repeat(np.repeat(starts, counts), pair_counts)
+    second += np.arange(len(first)) - np.repeat(pair_starts, pair_counts)
+
+    cosines = np.einsum("ij,ij->i", unit_normals[faces[first]], unit_normals[faces[second]])
+    smooth = cosines >= cos(crease_angle)
+    first, second = first[smooth], faces[second[smooth]]
+
+    sorted_normals = np.stack(
+        [np.bincount(first, face_normals[second, axis], minlength=len(order)) for axis in range(3)],
+        axis=1,
+        dtype=np.float64,
+    )
+    sorted_normals = normalized(sorted_normals, fallback=unit_normals[faces])
+
+    corner_normals = np.empty_like(sorted_normals)
+    corner_normals[order] = sorted_normals
+    normals, normal_index = np.unique(
+        np.round(corner_normals, NORMAL_DECIMALS), axis=0, return_inverse=True
+    )
+    return normals, normal_index.reshape(triangles.shape)
+
+
+def normalized(vectors: NDArray[np.float64], fallback: NDArray[np.float64] | None = None):
+    lengths = np.linalg.norm(vectors, axis=1)
+    valid = lengths > 0.0
+    result = np.zeros_like(vectors) if fallback is None else fallback.copy()
+    result[valid] = vectors[valid] / lengths[valid, None]
+    return result
+
+
+def split_vertices(
+    points: Points, triangles: Triangles, normals: Normals, normal_index: Triangles
+) -> tuple[Points, Normals, Triangles]:
+    # formats with a single normal per vertex need a vertex copy for every distinct normal
+    pairs = np.stack((triangles.reshape(-1), normal_index.reshape(-1)), axis=1)
+    unique_pairs, inverse = np.unique(pairs, axis=0, return_inverse=True)
+    return (
+        points[unique_pairs[:, 0]],
+        normals[unique_pairs[:, 1]],
+        inverse.reshape(triangles.shape),
+    )
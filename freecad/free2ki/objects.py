@@ -0,0 +1,111 @@
+from typing import NamedTuple, cast
+
+import FreeCAD
+from FreeCAD import DocumentObject, GeoFeature, GroupExtension
+from Part import Shape
+
+
+class ShapeInstance(NamedTuple):
+    obj: GeoFeature
+    # global transformation of the object's local (placement free) shape, for objects placed by
+    # links, None for objects which are located by their own global placement
+    matrix: FreeCAD.Matrix | None = None
+
+
+def has_shape(obj: GeoFeature):
+    return obj.getPropertyNameOfGeometry() == "Shape"
+
+
+def get_shape(obj: GeoFeature):
+    assert has_shape(obj)
+    return cast(Shape, obj.getPropertyByName("Shape"))
+
+
+def is_partdesign_feature(obj: DocumentObject):
+    return obj.__class__.__module__ == "PartDesign" and obj.__class__.__name__ == "Feature"
+
+
+def is_partdesign_body(obj: DocumentObject):
+    return obj.isDerivedFrom("PartDesign::Body")
+
+
+def is_link(obj: DocumentObject):
+    return obj.hasExtension("App::LinkBaseExtension")
+
+
+def is_shape_object(obj: DocumentObject):
+    return isinstance(obj, GeoFeature) and has_shape(obj) and bool(get_shape(obj).Faces)
+
+
+def get_shape_objects(objects: list[DocumentObject] | None = None) -> list[GeoFeature]:
+    # the objects owning the shapes (and materials), linked objects are resolved to their source
+    return list(dict.fromkeys(instance.obj for instance in get_shape_instances(objects)))
+
+
+def get_shape_instances(objects: list[DocumentObject] | None = None) -> list[ShapeInstance]:
+    if objects is None:
+        objects = FreeCAD.Gui.Selection.getSelection()
+
+    # depth first, in tree order, without recursion so deep assemblies don't hit the stack limit
+    stack: list[tuple[DocumentObject, FreeCAD.Matrix | None]] = [
+        (obj, None) for obj in reversed(objects)
+    ]
+    visited: set[tuple[str, tuple[float, ...] | None]] = set()
+    instances: list[ShapeInstance] = []
+
+    while stack:
+        obj, frame = stack.pop()
+        key = (obj.FullName, None if frame is None else tuple(frame.A))
+        if key in visited or not getattr(obj, "Visibility", True):
+            continue
+        visited.add(key)
+
+        children: list[tuple[DocumentObject, FreeCAD.Matrix | None]] = []
+        if is_link(obj):
+            # links have a placement, like geo features
+            link = cast(GeoFeature, obj)
+            if frame is None:
+                frame = link.getGlobalPlacement().Matrix * link.Placement.Matrix.inverse()
+            if elements := getattr(obj, "ElementList", None):
+                # link array elements are placed relative to the array
+                children = [(element, frame * link.Placement.Matrix) for element in elements]
+            else:
+                linked, matrix = cast(
+                    tuple[DocumentObject, FreeCAD.Matrix], obj.getLinkedObject(True, frame, True)
+                )
+                children = linked_children(linked, matrix, instances)
+        elif frame is not None:
+            children = linked_children(obj, frame * local_placement(obj), instances)
+        elif is_partdesign_feature(obj) and isinstance(obj, GeoFeature):
+            instances.append(ShapeInstance(obj))
+        elif obj.hasExtension("App::GroupExtension"):
+            children = [(child, None) for child in cast(GroupExtension, obj).Group]
+        elif is_shape_object(obj):
+            instances.append(ShapeInstance(cast(GeoFeature, obj)))
+
+        stack += reversed(children)
+
+    return instances
+
+
+def linked_children(
+    obj: DocumentObject, matrix: FreeCAD.Matrix, instances: list[ShapeInstance]
+) -> list[tuple[DocumentObject, FreeCAD.Matrix | None]]:
+    # matrix is the global transformation of obj's local coordinates, through one or more links
+    if is_partdesign_body(obj):
+        # the features of a body share its placement, the tip holds the materials
+        if (tip := getattr(obj, "Tip", None)) and is_shape_object(tip):
+            instances.append(ShapeInstance(tip, matrix))
+    elif obj.hasExtension("App::GroupExtension"):
+        return [(child, matrix) for child in cast(GroupExtension, obj).Group]
+    elif is_shape_object(obj):
+        instances.append(ShapeInstance(cast(GeoFeature, obj), matrix))
+    return []
+
+
+def local_placement(obj: DocumentObject) -> FreeCAD.Matrix:
+    if is_partdesign_body(obj) or obj.hasExtension("App::GeoFeatureGroupExtension"):
+        return cast(GeoFeature, obj).Placement.Matrix
+    if isinstance(obj, GeoFeature) and has_shape(obj):
+        return get_shape(obj).Placement.Matrix
+    return FreeCAD.Matrix()
@@ -0,0 +1,200 @@
+import json
+import threading
+import tracemalloc
+from pathlib import Path
+from time import perf_counter
+from typing import IO, Any, cast
+
+import FreeCAD
+
+PROFILE_SUFFIX = ".free2ki-profile.json"
+SUMMARY_OBJECTS = 10
+
+
+def prefs_profile_export() -> bool:
+    FSParam: FreeCAD.ParameterGrp = FreeCAD.ParamGet(
+        "User parameter:BaseApp/Preferences/Mod/Free2Ki"
+    )
+    return FSParam.GetBool("ProfileExport", False)
+
+
+def profile_path(path: Path):
+    return path.with_name(f"{path.stem}{PROFILE_SUFFIX}")
+
+
+class StageStats:
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.peak_memory = 0
+        self.triangles = 0
+        self.vertices = 0
+
+    def add(self, other: "StageStats"):
+        self.calls += other.calls
+        self.seconds += other.seconds
+        self.peak_memory = max(self.peak_memory, other.peak_memory)
+        self.triangles += other.triangles
+        self.vertices += other.vertices
+
+    def to_json(self):
+        return {
+            "calls": self.calls,
+            "seconds": self.seconds,
+            "peak_memory": self.peak_memory,
+            "triangles": self.triangles,
+            "vertices": self.vertices,
+        }
+
+
+class Stage:
+    def __init__(self, profile: "ExportProfile", name: str, obj: str | None):
+        self.profile = profile
+        self.name = name
+        self.obj = obj
+        self.discard = False
+        self.stats = StageStats()
+
+    def __enter__(self):
+        self.parent = self.profile.stages[-1] if self.profile.stages else None
+        if self.obj is None:
+            self.obj = self.parent.obj if self.parent else ""
+        self.profile.stages.append(self)
+        self.child_seconds = 0.0
+        self.memory, _ = tracemalloc.get_traced_memory()
+        self.child_peak = 0
+        tracemalloc.reset_peak()
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *_):
+        seconds = perf_counter() - self.start
+        peak = max(tracemalloc.get_traced_memory()[1], self.child_peak)
+        self.profile.stages.pop()
+
+        # nested stages (e.g. writes during serialization) only count towards their own stage
+        if self.parent:
+            self.parent.child_seconds += seconds
+            self.parent.child_peak = max(self.parent.child_peak, peak)
+        if not self.discard:
+            self.stats.calls += 1
+            self.stats.seconds += seconds - self.child_seconds
+            self.stats.peak_memory = max(self.stats.peak_memory, peak - self.memory)
+            self.profile.record(self.obj or "", self.name, self.stats)
+
+    def count(self, triangles: int, vertices: int):
+        self.stats.triangles += triangles
+        self.stats.vertices += vertices
+
+
+class NullStage:
+    obj = ""
+    discard = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        pass
+
+    def count(self, triangles: int, vertices: int):
+        pass
+
+
+NULL_STAGE = NullStage()
+
+
+class ExportProfile:
+    # peak memory is measured with tracemalloc, so it covers Python and NumPy allocations,
+    # but not the memory OpenCASCADE allocates while cleaning and meshing shapes
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.objects: dict[str, dict[str, StageStats]] = {}
+        self.local = threading.local()
+        self.start = perf_counter()
+        self.started_tracing = enabled and not tracemalloc.is_tracing()
+        if self.started_tracing:
+            tracemalloc.start()
+
+    @property
+    def stages(self) -> list[Stage]:
+        # GUI exports clean shapes on the main thread while the job thread meshes them, so
+        # every thread nests its own stages
+        if not hasattr(self.local, "stages"):
+            self.local.stages = []
+        return self.local.stages
+
+    def stage(self, name: str, obj: str | None = None) -> Stage | NullStage:
+        return Stage(self, name, obj) if self.enabled else NULL_STAGE
+
+    def record(self, obj: str, stage: str, stats: StageStats):
+        self.objects.setdefault(obj, {}).setdefault(stage, StageStats()).add(stats)
+
+    def wrap(self, file: IO[bytes], stage: str) -> IO[bytes]:
+        # the exporters only ever write to their files
+        return cast(IO[bytes], ProfiledFile(file, self, stage)) if self.enabled else file
+
+    def totals(self):
+        totals: dict[str, StageStats] = {}
+        for stages in self.objects.values():
+            for stage, stats in stages.items():
+                totals.setdefault(stage, StageStats()).add(stats)
+        return totals
+
+    def stop(self):
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+
+    def finish(self, path: Path):
+        if not self.enabled:
+            return
+        self.stop()
+
+        seconds = perf_counter() - self.start
+        data: dict[str, Any] = {
+            "path": str(path),
+            "seconds": seconds,
+            "stages": {stage: stats.to_json() for stage, stats in self.totals().items()},
+            "objects": {
+                obj or "(file)": {stage: stats.to_json() for stage, stats in stages.items()}
+                for obj, stages in self.objects.items()
+            },
+        }
+        sidecar = profile_path(path)
+        sidecar.write_text(json.dumps(data, indent=2))
+
+        self.print_summary(seconds)
+        print(f'info: wrote export profile "{sidecar}"')
+
+    def print_summary(self, seconds: float):
+        print(f"info: export profile ({seconds:.2f} s total)")
+        print(f"    {'stage':<12}{'time':>10}{'peak memory':>14}{'triangles':>12}{'vertices':>12}")
+        for stage, stats in self.totals().items():
+            print(
+                f"    {stage:<12}{stats.seconds:>9.3f}s{stats.peak_memory / 2**20:>11.1f} MiB"
+                f"{stats.triangles:>12}{stats.vertices:>12}"
+            )
+
+        object_seconds = {
+            obj: sum(stats.seconds for stats in stages.values())
+            for obj, stages in self.objects.items()
+            if obj
+        }
+        slowest = sorted(object_seconds.items(), key=lambda item: item[1], reverse=True)
+        if slowest:
+            print("info: slowest objects")
+            for obj, obj_seconds in slowest[:SUMMARY_OBJECTS]:
+                print(f"    {obj_seconds:>9.3f}s  {obj}")
+
+
+class ProfiledFile:
+    def __init__(self, file: IO[bytes], profile: ExportProfile, stage: str):
+        self.file = file
+        self.profile = profile
+        self.stage = stage
+
+    def write(self, data: bytes):
+        with self.profile.stage(self.stage):
+            return self.file.write(data)
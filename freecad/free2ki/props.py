@@ -0,0 +1,9 @@
+class FREE2KI_PROPS:
+    MATERIALS = "Free2KiMaterials"
+    MATERIAL_INDICES = "Free2KiMaterialIndices"
+
+    ALL = {MATERIALS, MATERIAL_INDICES}
+
+    LINEAR_DEFLECTION = "Free2KiLinearDeflection"
+    ANGULAR_DEFLECTION = "Free2KiAngularDeflection"
+    TRIANGLE_BUDGET = "Free2KiTriangleBudget"
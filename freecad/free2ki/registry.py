@@ -0,0 +1,77 @@
+from importlib import import_module
+from pathlib import Path
+from typing import Any
+
+ICONS_DIR = Path(__file__).parent.resolve() / "icons"
+
+
+class LazyCommand:
+    # FreeCAD only needs the resources to show a command, its implementation (and with it numpy,
+    # the PySide widgets and mat4cad) is imported when the command is first activated
+
+    def __init__(self, name: str, resources: dict[str, str]):
+        self.name = name
+        self.resources = resources
+        self.command: Any = None
+
+    def GetResources(self):
+        return self.resources
+
+    def Activated(self):
+        if self.command is None:
+            commands = import_module(".commands", __package__)
+            self.command = getattr(commands, self.name)()
+        self.command.Activated()
+
+
+COMMANDS = (
+    LazyCommand(
+        "Free2KiSetMaterials",
+        {
+            "Pixmap": str(ICONS_DIR / "material.png"),
+            "MenuText": "Set Materials",
+            "Tooltip": "Set material for selected, visible objects.",
+        },
+    ),
+    LazyCommand(
+        "Free2KiExport",
+        {
+            "Pixmap": str(ICONS_DIR / "kicad-export.png"),
+            "MenuText": "Export",
+            "Tooltip": "Export selected, visible objects (with children).",
+        },
+    ),
+)
+
+MENU_COMMANDS = (
+    LazyCommand(
+        "Free2KiSetMeshQuality",
+        {
+            "MenuText": "Set Mesh Quality",
+            "Tooltip": "Add per object mesh quality properties to selected, visible objects.",
+        },
+    ),
+    LazyCommand(
+        "Free2KiClearCache",
+        {
+            "MenuText": "Clear Cache",
+            "Tooltip": "Remove all cached tessellation results.",
+        },
+    ),
+)
+
+
+def register_commands():
+    import FreeCADGui as Gui
+
+    commands: list[str] = []
+    for command in COMMANDS:
+        commands.append(command.name)
+        Gui.addCommand(command.name, command)
+
+    menu_commands = list(commands)
+    for command in MENU_COMMANDS:
+        menu_commands.append(command.name)
+        Gui.addCommand(command.name, command)
+
+    return commands, menu_commands
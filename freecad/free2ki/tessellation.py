@@ -0,0 +1,241 @@
+import os
+from collections import deque
+from collections.abc import Iterable, Iterator, Sequence
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from contextlib import ExitStack
+from math import radians, sqrt
+from multiprocessing import get_all_start_methods, get_context
+from typing import TYPE_CHECKING, NamedTuple, TypeVar
+
+import numpy as np
+from numpy.typing import NDArray
+
+import FreeCAD
+import MeshPart
+import Part
+
+if TYPE_CHECKING:
+    from Mesh import Mesh
+
+    from .cache import TessellationCache
+
+Points = NDArray[np.float64]
+Triangles = NDArray[np.int64]
+Faces = NDArray[np.int64]
+MeshArrays = tuple[Points, Triangles, Faces]
+
+LINEAR_DEFLECTION = 0.01
+ANGULAR_DEFLECTION = radians(20)
+MAX_ANGULAR_DEFLECTION = radians(90)
+
+# a triangle budget is met once the mesh has between (1 - tolerance) * budget and budget triangles
+BUDGET_TOLERANCE = 0.1
+BUDGET_COARSEN_FACTOR = 4.0
+MAX_BUDGET_ITERATIONS = 12
+
+# workers are forked, so they inherit the already initialized FreeCAD modules
+SUPPORTS_PARALLEL = "fork" in get_all_start_methods()
+MAX_PENDING_PER_WORKER = 2
+
+T = TypeVar("T")
+
+
+class MeshParameters(NamedTuple):
+    linear_deflection: float = LINEAR_DEFLECTION
+    angular_deflection: float = ANGULAR_DEFLECTION
+    triangle_budget: int = 0
+
+    def scaled(self, factor: float):
+        return MeshParameters(
+            self.linear_deflection * factor,
+            min(self.angular_deflection * factor, MAX_ANGULAR_DEFLECTION),
+            max(int(self.triangle_budget / factor), 1) if self.triangle_budget else 0,
+        )
+
+
+def worker_count(workers: int):
+    if workers == 0:
+        workers = os.cpu_count() or 1
+    if workers > 1 and not SUPPORTS_PARALLEL:
+        print("warning: parallel export is not supported on this platform")
+        workers = 1
+    return workers
+
+
+def start_workers(workers: int) -> ProcessPoolExecutor | None:
+    # forking a multithreaded process (like the FreeCAD GUI) is only safe from the main thread,
+    # so exports running on another thread get their workers started up front
+    if not SUPPORTS_PARALLEL:
+        return None
+    executor = ProcessPoolExecutor(worker_count(workers), mp_context=get_context("fork"))
+    # with the fork start method, the first task starts all worker processes at once
+    executor.submit(os.getpid).result()
+    return executor
+
+
+def tessellate(
+    items: Iterable[tuple[T, Part.Shape | str, MeshParameters]],
+    workers: int = 1,
+    cache: "TessellationCache | None" = None,
+    executor: Executor | None = None,
+) -> Iterator[tuple[T, Points, Triangles, Faces]]:
+    # shapes can also be passed as BREP strings, which were serialized beforehand
+    workers = worker_count(workers)
+
+    if workers == 1 and cache is None and executor is None:
+        for item, shape, parameters in items:
+            yield item, *mesh_item(shape, parameters)
+        return
+
+    with ExitStack() as stack:
+        if executor is None and workers > 1:
+            executor = ProcessPoolExecutor(workers, mp_context=get_context("fork"))
+            stack.enter_context(executor)
+
+        pending: deque[tuple[T, str | None, Future[MeshArrays]]] = deque()
+        for item, shape, parameters in items:
+            brep = shape if isinstance(shape, str) else shape.exportBrepToString()
+            key = cache.key(brep, *parameters) if cache else None
+
+            if cache and key and (result := cache.load(key)):
+                pending.append((item, None, completed(result)))
+            elif executor:
+                pending.append((item, key, executor.submit(mesh_brep, brep, parameters)))
+            else:
+                pending.append((item, key, completed(mesh_item(shape, parameters))))
+
+            if len(pending) >= workers * MAX_PENDING_PER_WORKER:
+                yield collect(*pending.popleft(), cache)
+        while pending:
+            yield collect(*pending.popleft(), cache)
+
+
+def collect(
+    item: T,
+    key: str | None,
+    future: Future[MeshArrays],
+    cache: "TessellationCache | None",
+) -> tuple[T, Points, Triangles, Faces]:
+    points, triangles, faces = future.result()
+    if cache and key:
+        cache.store(key, points, triangles, faces)
+    return item, points, triangles, faces
+
+
+def completed(result: MeshArrays):
+    future: Future[MeshArrays] = Future()
+    future.set_result(result)
+    return future
+
+
+def mesh_item(shape: Part.Shape | str, parameters: MeshParameters) -> MeshArrays:
+    if isinstance(shape, str):
+        return mesh_brep(shape, parameters)
+    # meshing stores the triangulation in the shape and OCC reuses an existing (finer) one, so
+    # every level of detail of the same shape has to be meshed from a clean copy
+    return mesh_shape(shape.copy(), parameters)
+
+
+def mesh_shape(shape: Part.Shape, parameters: MeshParameters) -> MeshArrays:
+    if parameters.triangle_budget > 0:
+        return mesh_shape_to_budget(shape, parameters)
+
+    mesh = MeshPart.meshFromShape(
+        Shape=shape,
+        LinearDeflection=parameters.linear_deflection,
+        AngularDeflection=parameters.angular_deflection,
+        Segments=True,
+    )
+    return mesh_arrays(mesh)
+
+
+def mesh_shape_to_budget(shape: Part.Shape, parameters: MeshParameters) -> MeshArrays:
+    # the deflections are only ever coarsened, the given parameters are the finest quality used
+    budget = parameters.triangle_budget
+    unlimited = parameters._replace(triangle_budget=0)
+
+    def mesh_scaled(factor: float):
+        # meshing stores the triangulation in the shape, which would be reused by later iterations
+        return mesh_shape(shape.copy() if factor != 1.0 else shape, unlimited.scaled(factor))
+
+    result = mesh_scaled(1.0)
+    if len(result[1]) <= budget:
+        return result
+
+    # coarsen until the mesh is under the budget, then bisect (geometrically) towards the budget
+    fine, coarse = 1.0, None
+    coarsest, under = result, None
+    for _ in range(MAX_BUDGET_ITERATIONS):
+        factor = fine * BUDGET_COARSEN_FACTOR if coarse is None else sqrt(fine * coarse)
+        mesh = mesh_scaled(factor)
+        if (count := len(mesh[1])) <= budget:
+            coarse, under = factor, mesh
+            if count >= budget * (1.0 - BUDGET_TOLERANCE):
+                break
+        elif coarse is None and count >= len(coarsest[1]):
+            # coarser deflections don't reduce the triangle count anymore
+            break
+        else:
+            fine = factor
+            if coarse is None:
+                coarsest = mesh
+
+    if under is None:
+        print(f"warning: failed to mesh shape with less than {budget} triangles")
+        return coarsest
+    return under
+
+
+def mesh_brep(brep: str, parameters: MeshParameters) -> MeshArrays:
+    shape = Part.Shape()
+    shape.importBrepFromString(brep)
+    return mesh_shape(shape, parameters)
+
+
+def mesh_arrays(mesh: "Mesh") -> MeshArrays:
+    points, facets = mesh.Topology
+    # with Segments=True there is one segment per shape face, in the order of shape.Faces
+    faces = np.full(len(facets), -1, dtype=np.int64)
+    for face_index in range(mesh.countSegments()):
+        faces[np.array(mesh.getSegment(face_index), dtype=np.int64)] = face_index
+    return (
+        np.array(points, dtype=np.float64).reshape(-1, 3),
+        np.array(facets, dtype=np.int64).reshape(-1, 3),
+        faces,
+    )
+
+
+def split_mesh(
+    points: Points, triangles: Triangles, groups: NDArray[np.int64], count: int
+) -> list[tuple[Points, Triangles]]:
+    # triangles in negative groups are dropped
+    order = np.argsort(groups, kind="stable")
+    bounds = np.searchsorted(groups[order], np.arange(count + 1))
+    return [
+        compact(points, triangles[order[start:end]]) for start, end in zip(bounds[:-1], bounds[1:])
+    ]
+
+
+def merge_meshes(meshes: Sequence[tuple[Points, Triangles]]) -> tuple[Points, Triangles]:
+    point_counts = [len(points) for points, _ in meshes]
+    triangle_counts = [len(triangles) for _, triangles in meshes]
+    offsets = np.repeat(np.cumsum([0, *point_counts[:-1]]), triangle_counts)
+    return (
+        np.concatenate([points for points, _ in meshes]),
+        np.concatenate([triangles for _, triangles in meshes]) + offsets[:, None],
+    )
+
+
+def compact(points: Points, triangles: Triangles) -> tuple[Points, Triangles]:
+    used, inverse = np.unique(triangles, return_inverse=True)
+    return points[used], inverse.reshape(triangles.shape)
+
+
+def matrix_array(matrix: FreeCAD.Matrix, scale: float = 1.0) -> NDArray[np.float64]:
+    array = np.array(matrix.A, dtype=np.float64).reshape(4, 4)
+    array[:3] *= scale
+    return array
+
+
+def transform_points(points: Points, matrix: NDArray[np.float64]) -> Points:
+    return points @ matrix[:3, :3].T + matrix[:3, 3]
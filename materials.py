@@ -0,0 +1,3 @@
+BASE_MATERIALS={"plastic":None}
+BASE_MATERIAL_COLORS={"plastic":{"mouse_grey":(0.5,0.5,0.5),"black":(0,0,0)}}
+BASE_MATERIAL_VARIANTS={"plastic":{"semi_matte":None}}
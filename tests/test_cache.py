@@ -0,0 +1,34 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+pytest.importorskip("FreeCAD")
+
+from freecad.free2ki.cache import TessellationCache  # noqa: E402
+
+POINTS = np.array([[0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [0.0, 1.0, 0.0]])
+TRIANGLES = np.array([[0, 1, 2]], dtype=np.int64)
+FACES = np.array([0], dtype=np.int64)
+
+
+def test_store_and_load(tmp_path: Path):
+    cache = TessellationCache(tmp_path, max_size=1 << 20)
+    cache.store("key", POINTS, TRIANGLES, FACES)
+    result = cache.load("key")
+    assert result is not None
+    for loaded, stored in zip(result, (POINTS, TRIANGLES, FACES)):
+        np.testing.assert_array_equal(loaded, stored)
+    assert [path.name for path in tmp_path.iterdir()] == ["key.npz"]
+
+
+def test_temp_files_are_not_entries(tmp_path: Path):
+    # a store of another process in progress must neither be stat'ed nor pruned
+    cache = TessellationCache(tmp_path, max_size=0)
+    temp_path = tmp_path / f"key.1234{TessellationCache.TEMP_SUFFIX}"
+    temp_path.write_bytes(b"")
+    cache.store("key", POINTS, TRIANGLES, FACES)
+    assert [path.name for path, _ in cache.entries()] == ["key.npz"]
+    cache.prune()
+    assert cache.entries() == []
+    assert temp_path.exists()
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("FreeCAD")
+
+from freecad.free2ki.decimation import DecimationParameters, decimate, simplify  # noqa: E402
+
+CUBE_POINTS = np.array(
+    [[x, y, z] for x in (0.0, 1.0) for y in (0.0, 1.0) for z in (0.0, 1.0)], dtype=np.float64
+)
+CUBE_TRIANGLES = np.array(
+    [
+        [0, 1, 3], [0, 3, 2],  # x = 0
+        [4, 6, 7], [4, 7, 5],  # x = 1
+        [0, 4, 5], [0, 5, 1],  # y = 0
+        [2, 3, 7], [2, 7, 6],  # y = 1
+        [0, 2, 6], [0, 6, 4],  # z = 0
+        [1, 5, 7], [1, 7, 3],  # z = 1
+    ],
+    dtype=np.int64,
+)  # fmt: skip
+
+
+def is_closed(triangles: np.ndarray):
+    # every edge of a closed, manifold mesh is shared by exactly two triangles
+    edges = np.sort(triangles[:, [[0, 1], [1, 2], [2, 0]]].reshape(-1, 2), axis=1)
+    _, counts = np.unique(edges, axis=0, return_counts=True)
+    return bool(np.all(counts == 2))
+
+
+def sphere(subdivisions: int = 2):
+    points, triangles = CUBE_POINTS - 0.5, CUBE_TRIANGLES
+    for _ in range(subdivisions):
+        edges = np.sort(triangles[:, [[0, 1], [1, 2], [2, 0]]].reshape(-1, 2), axis=1)
+        unique_edges, inverse = np.unique(edges, axis=0, return_inverse=True)
+        midpoints = len(points) + inverse.reshape(-1, 3)
+        points = np.concatenate((points, points[unique_edges].mean(axis=1)))
+        a, b, c = triangles.T
+        ab, bc, ca = midpoints.T
+        triangles = np.concatenate(
+            [np.stack(t, axis=1) for t in ((a, ab, ca), (ab, b, bc), (ca, bc, c), (ab, bc, ca))]
+        )
+    return points / np.linalg.norm(points, axis=1)[:, None], triangles
+
+
+@pytest.mark.parametrize("ratio", [0.5, 0.25, 0.1, 0.0])
+def test_decimated_cube_stays_closed(ratio: float):
+    _, triangles = decimate(CUBE_POINTS, CUBE_TRIANGLES, int(len(CUBE_TRIANGLES) * ratio))
+    assert len(triangles) >= 4
+    assert is_closed(triangles)
+
+
+def test_decimated_parts_stay_closed():
+    # two separate cubes in one material group, each has to survive on its own
+    points = np.concatenate((CUBE_POINTS, CUBE_POINTS + 2.0))
+    triangles = np.concatenate((CUBE_TRIANGLES, CUBE_TRIANGLES + len(CUBE_POINTS)))
+    points, triangles = simplify(points, triangles, DecimationParameters(ratio=0.1))
+    assert len(triangles) >= 8
+    assert is_closed(triangles)
+    used = points[np.unique(triangles)]
+    assert np.any(np.all(used < 1.5, axis=1)) and np.any(np.all(used > 1.5, axis=1))
+
+
+def test_decimated_sphere_stays_closed():
+    points, triangles = sphere()
+    points, triangles = decimate(points, triangles, len(triangles) // 10)
+    assert 4 <= len(triangles) < len(sphere()[1])
+    assert is_closed(triangles)
+
+
+def test_max_error_limits_decimation():
+    points, triangles = sphere(3)
+    _, coarse = decimate(points, triangles, 0, max_error=0.1)
+    _, fine = decimate(points, triangles, 0, max_error=0.001)
+    assert len(coarse) < len(fine) <= len(triangles)
+    assert is_closed(coarse) and is_closed(fine)
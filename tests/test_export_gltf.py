@@ -0,0 +1,50 @@
+import io
+import json
+import struct
+
+import numpy as np
+import pytest
+
+pytest.importorskip("FreeCAD")
+
+from freecad.free2ki.export_gltf import GltfBuilder  # noqa: E402
+from freecad.free2ki.mat4cad import Material  # noqa: E402
+
+TRIANGLE_POINTS = np.array([[0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [0.0, 1.0, 0.0]])
+TRIANGLE = np.array([[0, 1, 2]], dtype=np.int64)
+
+NO_POINTS = np.zeros((0, 3), dtype=np.float64)
+NO_TRIANGLES = np.zeros((0, 3), dtype=np.int64)
+
+
+def read_gltf(builder: GltfBuilder):
+    file = io.BytesIO()
+    builder.write(file)
+    file.seek(12)
+    length, _ = struct.unpack("<II", file.read(8))
+    return json.loads(file.read(length))
+
+
+@pytest.mark.parametrize("export_normals", [False, True])
+def test_empty_primitives_are_skipped(export_normals: bool):
+    builder = GltfBuilder(export_normals)
+    mesh = builder.add_mesh(
+        "part",
+        [
+            (NO_POINTS, NO_TRIANGLES, "empty", Material()),
+            (TRIANGLE_POINTS, TRIANGLE, "full", Material()),
+        ],
+    )
+    assert mesh is not None
+    builder.add_node("part", mesh)
+
+    gltf = read_gltf(builder)
+    (primitive,) = gltf["meshes"][0]["primitives"]
+    assert gltf["materials"][primitive["material"]]["name"] == "full"
+    assert all(accessor["count"] for accessor in gltf["accessors"])
+
+
+def test_empty_meshes_are_skipped():
+    builder = GltfBuilder()
+    assert builder.add_mesh("part", [(NO_POINTS, NO_TRIANGLES, "empty", Material())]) is None
+    assert "meshes" not in read_gltf(builder)